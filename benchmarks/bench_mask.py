@@ -0,0 +1,53 @@
+"""除外する行の判定（mask_invalid_rows）のベンチマーク
+    再起動と読み取り失敗を含む合成ファイルを読み込み、読込全体（load_stg_files）の時間と、
+    そのうち除外する行の判定にかかる時間の割合を表示する
+
+    python benchmarks/bench_mask.py --rows 5000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stg_core import add_delta_time, load_stg_files, mask_invalid_rows  # noqa: E402
+from synth_stg import write_stg_rotation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5_000_000, help='重複を除いた合計行数')
+    parser.add_argument('--files', type=int, default=4, help='ローテーションファイルの数')
+    parser.add_argument('--resets', type=int, default=10, help='再起動の回数')
+    parser.add_argument('--repeat', type=int, default=5, help='判定の繰り返し回数（最小値を表示する）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filenames = write_stg_rotation(tmpdir, args.files, args.rows, overlap=3600,
+                                       gap_rate=0.001, resets=args.resets)
+        t = time.perf_counter()
+        df = load_stg_files(filenames, max_workers=1)
+        load_sec = time.perf_counter() - t
+
+    # マスク前の状態（delta_timeの計算直後）に戻したコピーで判定だけを測定する
+    source = df[['uptime', 'recv', 'send']].copy()
+    add_delta_time(source)
+    times = []
+    for _ in range(args.repeat):
+        work = source.copy()
+        t = time.perf_counter()
+        masked = mask_invalid_rows(work)
+        times.append(time.perf_counter() - t)
+    mask_sec = min(times)
+
+    print(f'rows   : {len(df):,}')
+    print(f'masked : {masked}')
+    print(f'load   : {load_sec:8.3f} sec')
+    print(f'mask   : {mask_sec:8.3f} sec  {len(df) / mask_sec:14,.0f} rows/sec')
+    print(f'ratio  : {mask_sec / load_sec:8.1%} of load')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""読込時のピークメモリのベンチマーク
+    入力サイズごとに、従来の一括読込（read_stg_file + merge_stg_frames）と
+    省メモリ読込（read_stg_stream）のピークRSSを別プロセスで測定する
+
+    python benchmarks/bench_memory.py --rows 500000 1000000 2000000 --budget 64
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def peak_rss() -> int:
+    """このプロセスのピークRSS（バイト）を返す"""
+    # Linuxのru_maxrssはexec前の親プロセスの値を引き継ぐので、VmHWMを優先する
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    try:
+        import resource
+    except ImportError:  # Windows
+        import ctypes
+        import ctypes.wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', ctypes.wintypes.DWORD), ('PageFaultCount', ctypes.wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in [
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage',
+                ]
+            ]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def child(mode: str, filenames: list, budget: int):
+    """子プロセスで読み込み、ピークRSSを出力する"""
+    from stg_core import merge_stg_frames, read_stg_file, read_stg_stream
+
+    base = peak_rss()
+    if mode == 'batch':
+        df = merge_stg_frames([read_stg_file(filename) for filename in filenames])
+    else:
+        df = read_stg_stream(filenames, memory_budget=budget)
+    print(len(df), base, peak_rss())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[250_000, 500_000, 1_000_000, 2_000_000],
+                        help='入力の合計行数（複数指定可）')
+    parser.add_argument('--files', type=int, default=4, help='ファイル数（ローテーションファイル）')
+    parser.add_argument('--budget', type=int, default=64, help='省メモリ読込のメモリ目安（MB）')
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1:], args.budget * 1024**2)
+        return
+
+    import pandas as pd
+    from synth_stg import write_stg_file
+
+    print(f'{"rows":>12} {"input MB":>9} {"mode":>7} {"peak RSS MB":>12} {"load MB":>9}')
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            per_file = rows // args.files
+            for i in range(args.files):
+                filename = os.path.join(tmpdir, f'bench.csv.{i:03}')
+                start = pd.Timestamp('2021-08-01') + pd.Timedelta(seconds=per_file * i)
+                write_stg_file(filename, per_file, start=str(start), seed=i)
+                filenames.append(filename)
+            input_mb = sum(os.path.getsize(f) for f in filenames) / 1024**2
+            for mode in ['batch', 'stream']:
+                out = subprocess.run(
+                    [sys.executable, __file__, '--budget', str(args.budget), '--child', mode, *filenames],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                base, peak = int(out[1]), int(out[2])
+                print(f'{rows:>12,} {input_mb:>9.1f} {mode:>7} {peak / 1024**2:>12.1f} {(peak - base) / 1024**2:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""日時変換のベンチマーク
+    従来の pd.to_datetime（フォーマット推定）と parse_stg_date の rows/sec を比較する
+
+    python benchmarks/bench_parse_date.py --rows 2000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stg_core import parse_stg_date  # noqa: E402
+from synth_stg import write_stg_file  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000, help='行数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'bench.csv')
+        write_stg_file(filename, args.rows)
+        dates = pd.read_csv(
+            filename, encoding='SHIFT-JIS', header=1, names=['date', 'uptime', 'recv', 'send'],
+        )['date']
+
+    t = time.perf_counter()
+    before = pd.to_datetime(dates.str.replace('Avg', 'Aug', regex=False))
+    before_sec = time.perf_counter() - t
+
+    t = time.perf_counter()
+    after = parse_stg_date(dates)
+    after_sec = time.perf_counter() - t
+
+    assert before.equals(after), '変換結果が一致しません'
+    print(f'rows   : {args.rows:,}')
+    print(f'before : {before_sec:8.3f} sec  {args.rows / before_sec:14,.0f} rows/sec')
+    print(f'after  : {after_sec:8.3f} sec  {args.rows / after_sec:14,.0f} rows/sec')
+    print(f'speedup: {before_sec / after_sec:8.1f} x')
+
+
+if __name__ == '__main__':
+    main()
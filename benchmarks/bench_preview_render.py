@@ -0,0 +1,102 @@
+"""プレビュー描画の所要時間を測定する
+    設定（集計単位・縦軸の単位・スケール）を順に変えながらプレビューを描画し、
+    従来の方法（ax.cla + df.plot + canvas.draw）と PreviewRenderer の
+    1回ごとの描画時間を出力する
+
+    python benchmarks/bench_preview_render.py --rows 2000000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import matplotlib.dates as mdates  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+from matplotlib.ticker import AutoMinorLocator  # noqa: E402
+
+from stg_core import PreviewRenderer, decimate_minmax, resample_df  # noqa: E402
+from synth_stg import make_loaded_frame  # noqa: E402
+
+# 描画する設定の順番（集計単位, 縦軸の単位, 縦軸の上限（Noneは自動））
+SETTINGS = [
+    ('1T', 'Mbps', None),
+    ('1T', 'Mbps', 1000),
+    ('5T', 'Mbps', 1000),
+    ('5T', 'Mbps', 1000),
+    ('1T', 'kbps', None),
+    ('1H', 'kbps', None),
+    ('org', 'Mbps', None),
+    ('org', 'Mbps', None),
+]
+
+
+def draw_before(fig, ax, df, recv_unit, send_unit, axis_unit, ylim_top, text):
+    """従来のプレビュー描画（ButtonFrame.preview_graph の変更前の処理）"""
+    ax.cla()
+    df.plot(ax=ax, grid=True, y=[recv_unit, send_unit], title='192.0.2.1 スループット', rot=30, x_compat=True)
+    ax.set_xlabel('日時')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d %H:%M'))
+    ax.xaxis.set_minor_locator(AutoMinorLocator(6))
+    ax.set_ylabel(axis_unit)
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, loc: f'{x:,.1f}'))
+    ax.yaxis.set_minor_locator(AutoMinorLocator())
+    ax.grid(True, axis='both', which='major', color='gray', linestyle='--', alpha=0.9)
+    ax.grid(True, axis='both', which='minor', color='gray', linestyle='--', alpha=0.2)
+    if ylim_top is None:
+        ax.set_ylim(0,)
+    else:
+        ax.set_ylim([0, ylim_top])
+    ax.text(0.05, 0.9, text, family='ms gothic', transform=ax.transAxes)
+    fig.canvas.draw()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000, help='行数（1秒間隔）')
+    parser.add_argument('--days', type=int, default=1, help='プレビューする日数')
+    args = parser.parse_args()
+    # フォントが見つからない警告を抑止する
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    df = make_loaded_frame(args.rows)
+    day_from = str(df.index[0].date())
+    day_to = str((df.index[0] + pd.Timedelta(days=args.days - 1)).date())
+
+    fig_before = Figure()
+    FigureCanvasAgg(fig_before)
+    ax_before = fig_before.add_subplot()
+    fig_after = Figure()
+    ax_after = fig_after.add_subplot()
+    renderer = PreviewRenderer(fig_after, ax_after, FigureCanvasAgg(fig_after))
+    width = int(fig_after.get_figwidth() * fig_after.dpi)
+
+    print(f'{"rule":>5} {"unit":>5} {"ylim":>6} {"before ms":>10} {"after ms":>10}')
+    for rule, unit, ylim_top in SETTINGS:
+        (view, recv_unit, send_unit, axis_unit, div_unit, r_max, s_max) = resample_df(
+            df, rule, day_from, day_to, unit)
+        view = decimate_minmax(view, [recv_unit, send_unit], width)
+        text = r_max + '\n' + s_max
+
+        t = time.perf_counter()
+        draw_before(fig_before, ax_before, view, recv_unit, send_unit, axis_unit, ylim_top, text)
+        before = time.perf_counter() - t
+
+        renderer.render(view, [recv_unit, send_unit], '192.0.2.1 スループット', axis_unit, ylim_top, text)
+        after = renderer.timings[-1]
+        print(f'{rule:>5} {unit:>5} {str(ylim_top):>6} {before * 1e3:>10.1f} {after * 1e3:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
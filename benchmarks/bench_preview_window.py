@@ -0,0 +1,60 @@
+"""プレビュー（resample_df）のベンチマーク
+    アーカイブ全体をリサンプルしてから期間を切り出す従来の方法と、
+    期間を切り出してからリサンプルする resample_df の処理時間を比較する
+
+    python benchmarks/bench_preview_window.py --months 1 3 6 --interval 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stg_core import calc_bps, resample_df  # noqa: E402
+from synth_stg import make_loaded_frame  # noqa: E402
+
+
+def resample_before(df: pd.DataFrame, rule: str, date_from: str, date_to: str) -> pd.DataFrame:
+    """従来の方法（全体をリサンプルしてから期間を切り出す）"""
+    df = df.copy() if rule == 'org' else df.resample(rule=rule).sum()
+    df = df[date_from:date_to]
+    df['recv_Mbps'] = calc_bps(df['recv'], df['delta_time']) / 1e6
+    df['send_Mbps'] = calc_bps(df['send'], df['delta_time']) / 1e6
+    return df
+
+
+def timeit(func, repeat: int) -> float:
+    """funcをrepeat回実行した最短時間（秒）を返す"""
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--months', type=int, nargs='+', default=[1, 3, 6], help='アーカイブの月数')
+    parser.add_argument('--interval', type=int, default=5, help='取得間隔（秒）')
+    parser.add_argument('--rules', nargs='+', default=['org', '1T', '1H'], help='集計単位')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数')
+    args = parser.parse_args()
+
+    print(f'{"months":>6} {"rows":>12} {"rule":>5} {"before ms":>10} {"after ms":>10} {"speedup":>8}')
+    for months in args.months:
+        rows = months * 30 * 86400 // args.interval
+        df = make_loaded_frame(rows, interval=args.interval)
+        day = str(df.index[len(df) // 2].date())  # 中央の1日をプレビューする
+        for rule in args.rules:
+            before = timeit(lambda: resample_before(df, rule, day, day), args.repeat)
+            after = timeit(lambda: resample_df(df, rule, day, day, 'Mbps'), args.repeat)
+            print(f'{months:>6} {rows:>12,} {rule:>5} {before * 1e3:>10.1f} {after * 1e3:>10.1f} '
+                  f'{before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
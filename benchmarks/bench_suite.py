@@ -0,0 +1,211 @@
+"""読込・集計・描画・出力のベンチマーク（リビジョン間の比較用）
+    合成STG CSVファイル（ローテーション、重複、読み取り失敗、再起動を含む）を生成し、
+    読込、集計単位（MEAN_TIMES）ごとの集計、期間の切り出し、描画、CSVファイル出力の
+    所要時間を測定してJSONファイルに保存する。--compareで以前の結果と比較し、
+    しきい値より遅くなった項目があれば終了コード1を返す
+
+    python benchmarks/bench_suite.py --rows 2000000 --files 4 --output before.json
+    python benchmarks/bench_suite.py --rows 2000000 --files 4 --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from stg_core import (MEAN_TIMES, PLOT_BUCKETS_PER_PIXEL, StgCache,  # noqa: E402
+                      decimate_minmax, load_stg_files, perf, plot_graph,
+                      resample_df, slice_period, write_csv)
+from synth_stg import write_stg_rotation  # noqa: E402
+
+# 比較で遅くなったとみなす比率（今回 / 以前）
+THRESHOLD = 1.2
+# 比較の対象外とする短い処理（秒）。測定のばらつきで誤判定しないようにする
+MIN_SECONDS = 0.005
+
+
+def revision() -> str:
+    """gitのリビジョン（取得できなければ'unknown'）を返す"""
+    try:
+        out = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True, capture_output=True, text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return out.stdout.strip()
+
+
+def measure(results: dict, name: str, func, repeat: int, rows: int = None):
+    """func()をrepeat回実行し、最小・中央値の時間をresults[name]に記録して最後の戻り値を返す"""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - t)
+    results[name] = {'min': min(times), 'median': statistics.median(times), 'repeat': repeat, 'rows': rows}
+    print(f' {name:<24} {min(times):>9.4f} sec  (median {statistics.median(times):.4f}){"":<4}'
+          + ('' if rows is None else f'{rows:>12,} rows'))
+    return value
+
+
+def run(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filenames = write_stg_rotation(
+            tmpdir, args.files, args.rows, overlap=args.overlap, interval=args.interval,
+            seed=args.seed, gap_rate=args.gap_rate, resets=args.resets,
+        )
+        input_bytes = sum(os.path.getsize(filename) for filename in filenames)
+        print(f'input: {len(filenames)} files, {args.rows:,} rows, {input_bytes / 1024**2:,.1f} MB')
+
+        # 読込（キャッシュなし、プロセスプールあり・なし、キャッシュあり）
+        perf.clear()
+        df = measure(results, 'load', lambda: load_stg_files(filenames), args.repeat)
+        spans = perf.summary()
+        measure(results, 'load_sequential', lambda: load_stg_files(filenames, max_workers=1), args.repeat)
+        cache = StgCache(cache_dir=os.path.join(tmpdir, 'cache'))
+        load_stg_files(filenames, cache=cache, max_workers=1)
+        measure(results, 'load_cached', lambda: load_stg_files(filenames, cache=cache, max_workers=1),
+                args.repeat)
+        measure(results, 'load_stream', lambda: load_stg_files(filenames, stream=True), args.repeat)
+        rows = len(df)
+
+        # 集計単位ごとの集計（全期間）
+        date_from = str(df.index[0].date())
+        date_to = str(df.index[-1].date())
+        views = {}
+        for rule in MEAN_TIMES.values():
+            views[rule] = measure(
+                results, f'resample:{rule}',
+                lambda: resample_df(df, rule, date_from, date_to, 'Mbps'), args.repeat, rows,
+            )
+
+        # 期間の切り出し（1日）と、1日分の集計
+        day = str(df.index[len(df) // 2].date())
+        part = measure(results, 'slice:1day', lambda: slice_period(df, day, day), args.repeat, rows)
+        measure(results, 'resample:1day:1T', lambda: resample_df(df, '1T', day, day, 'Mbps'),
+                args.repeat, len(part))
+
+        # 描画（間引き、グラフ作成、PNG出力）
+        (view, recv_unit, send_unit, axis_unit, _, r_max, s_max) = views['1T']
+        columns = [recv_unit, send_unit]
+        size = matplotlib.rcParams['figure.figsize']
+        dpi = matplotlib.rcParams['figure.dpi']
+        buckets = int(size[0] * dpi * PLOT_BUCKETS_PER_PIXEL)
+        raw = views['org'][0]
+        decimated = measure(results, 'decimate:org', lambda: decimate_minmax(raw, columns, buckets),
+                            args.repeat, len(raw))
+
+        def plot():
+            fig = Figure(figsize=size, dpi=dpi)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            plot_graph(decimated, columns, title='bench', axis_unit=axis_unit, ylim_top=None,
+                       text=r_max + '\n' + s_max, ax=ax)
+            return fig
+
+        fig = measure(results, 'plot', plot, args.repeat, len(decimated))
+        measure(results, 'savefig:png', lambda: fig.savefig(os.path.join(tmpdir, 'bench.png')), args.repeat)
+
+        # CSVファイル出力（生データと1分平均）
+        for rule in ['org', '1T']:
+            (view, recv_unit, send_unit, *_) = views[rule]
+            output = os.path.join(tmpdir, f'bench_{rule}.csv')
+            measure(results, f'export:{rule}',
+                    lambda: write_csv(view, ['delta_time', recv_unit, send_unit], output),
+                    args.repeat, len(view))
+
+    return {
+        'meta': {
+            'revision': revision(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'matplotlib': matplotlib.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'params': {
+                'rows': args.rows, 'files': args.files, 'overlap': args.overlap, 'interval': args.interval,
+                'gap_rate': args.gap_rate, 'resets': args.resets, 'seed': args.seed, 'repeat': args.repeat,
+            },
+            'input_bytes': input_bytes,
+            'loaded_rows': rows,
+        },
+        'results': results,
+        'spans': spans,  # 読込の1回目の処理ごとの内訳（perf.summary）
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> int:
+    """以前の結果と比較して表示し、遅くなった項目の数を返す"""
+    print(f'\ncompare: {baseline["meta"]["revision"]} -> {report["meta"]["revision"]}')
+    if baseline['meta']['params'] != report['meta']['params']:
+        print(' Warning!：測定条件が異なります')
+    regressions = 0
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f' {name:<24} {"-":>9} -> {result["min"]:>9.4f} sec')
+            continue
+        ratio = result['min'] / before['min'] if before['min'] > 0 else float('inf')
+        slow = ratio > threshold and result['min'] >= MIN_SECONDS
+        regressions += slow
+        print(f' {name:<24} {before["min"]:>9.4f} -> {result["min"]:>9.4f} sec  x{ratio:5.2f}'
+              + ('  << 遅くなりました' if slow else ''))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='重複を除いた合計行数')
+    parser.add_argument('--files', type=int, default=4, help='ローテーションファイルの数')
+    parser.add_argument('--overlap', type=int, default=3600, help='前のファイルと重複する行数')
+    parser.add_argument('--interval', type=int, default=1, help='取得間隔（秒）')
+    parser.add_argument('--gap-rate', type=float, default=0.001, help='uptimeが0の行（読み取り失敗）の割合')
+    parser.add_argument('--resets', type=int, default=2, help='再起動の回数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--repeat', type=int, default=3, help='各項目の繰り返し回数（最小値で比較する）')
+    parser.add_argument('--output', default=None, help='結果を保存するJSONファイル')
+    parser.add_argument('--compare', default=None, help='比較する以前の結果のJSONファイル')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='遅くなったとみなす比率')
+    args = parser.parse_args()
+
+    # フォントがない環境の警告を表示しない
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    report = run(args)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f'"{os.path.abspath(args.output)}"')
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold) > 0:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
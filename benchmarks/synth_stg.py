@@ -0,0 +1,134 @@
+"""ベンチマーク用の合成STG CSVファイルを生成する
+    実際のSTGのCSVファイルと同じく、1行目の対象情報、Shift-JIS、Avgの月名（Augのバグ）を再現する。
+    オプションで、読み取り失敗（uptimeが0の行）、機器の再起動（uptimeが戻り、カウンタ値が
+    そのまま記録される行）、重複した範囲を持つローテーションファイルも生成できる
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# 合成ファイルの日時フォーマット（STG_DATE_FORMATSの先頭と同じ形式）
+DATE_FORMAT = '%d %b %Y %H:%M:%S'
+
+
+def make_stg_frame(rows: int, start: str = '2021-08-01', interval: int = 1,
+                   seed: int = 0, gap_rate: float = 0.0, resets: int = 0) -> pd.DataFrame:
+    """STGのCSVファイルと同じ内容のDataFrameを作成する
+        日時は文字列で、STGのバグと同じくAugをAvgにする
+
+    Args:
+        rows (int): 行数
+        start (str): 開始日時
+        interval (int): 取得間隔（秒）
+        seed (int): 乱数のシード
+        gap_rate (float): uptimeが0の行（読み取り失敗）の割合
+        resets (int): 再起動の回数（uptimeが0から数え直し、その行の値はカウンタの値になる）
+
+    Returns:
+        pd.DataFrame: date, uptime, recv, send の4カラムのDataFrame
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start=start, periods=rows, freq=f'{interval}S')
+    uptime = np.arange(rows, dtype='int64') * interval * 100 + 1
+    recv = rng.integers(0, 12_500_000 * interval, rows)
+    send = rng.integers(0, 1_250_000 * interval, rows)
+    if resets > 0 and rows > 1:
+        # 再起動した行からuptimeを数え直し、差分ではなくカウンタの値（32bit）が入る
+        for pos in np.sort(rng.choice(np.arange(1, rows), size=min(resets, rows - 1), replace=False)):
+            uptime[pos:] -= uptime[pos] - rng.integers(1, 6000)
+            recv[pos] = rng.integers(2**31, 2**32)
+            send[pos] = rng.integers(2**31, 2**32)
+    if gap_rate > 0:
+        gaps = rng.random(rows) < gap_rate
+        uptime[gaps] = 0
+        recv[gaps] = 0
+        send[gaps] = 0
+    return pd.DataFrame({
+        'date': dates.strftime(DATE_FORMAT).str.replace('Aug', 'Avg', regex=False),
+        'uptime': uptime,
+        'recv': recv,
+        'send': send,
+    })
+
+
+def _write_stg_frame(path: str, df: pd.DataFrame, interval: int, target: str):
+    with open(path, 'w', encoding='SHIFT-JIS', newline='') as f:
+        f.write(f'STG,Target Address:{target},OID:1.3.6.1.2.1.2.2.1.10.1,Interval:{interval},ifIndex:1\n')
+        f.write('Date,Uptime,Recv,Send\n')
+        df.to_csv(f, header=False, index=False)
+
+
+def write_stg_file(path: str, rows: int, start: str = '2021-08-01', interval: int = 1,
+                   target: str = '192.0.2.1', seed: int = 0, gap_rate: float = 0.0, resets: int = 0):
+    """合成STG CSVファイルを書き出す
+
+    Args:
+        path (str): 出力ファイル名
+        rows (int): 行数
+        start (str): 開始日時
+        interval (int): 取得間隔（秒）
+        target (str): ヘッダ行のTarget Address
+        seed (int): 乱数のシード
+        gap_rate (float): uptimeが0の行（読み取り失敗）の割合
+        resets (int): 再起動の回数
+    """
+    df = make_stg_frame(rows, start=start, interval=interval, seed=seed, gap_rate=gap_rate, resets=resets)
+    _write_stg_frame(path, df, interval, target)
+
+
+def write_stg_rotation(directory: str, files: int, rows: int, overlap: int = 0,
+                       start: str = '2021-08-01', interval: int = 1, target: str = '192.0.2.1',
+                       seed: int = 0, gap_rate: float = 0.0, resets: int = 0,
+                       basename: str = 'stg') -> list:
+    """ローテーションした合成STG CSVファイル（stg.csv.000, stg.csv.001, ..., stg.csv）を書き出す
+        連続したデータを分割し、各ファイルの先頭に前のファイルの末尾overlap行を重複させる
+
+    Args:
+        directory (str): 出力先ディレクトリ
+        files (int): ファイル数
+        rows (int): 重複を除いた合計行数
+        overlap (int): 前のファイルと重複させる行数
+        start (str): 開始日時
+        interval (int): 取得間隔（秒）
+        target (str): ヘッダ行のTarget Address
+        seed (int): 乱数のシード
+        gap_rate (float): uptimeが0の行（読み取り失敗）の割合
+        resets (int): 再起動の回数（全ファイルの合計）
+
+    Returns:
+        list: 書き出したファイル名のリスト（古い順）
+    """
+    df = make_stg_frame(rows, start=start, interval=interval, seed=seed, gap_rate=gap_rate, resets=resets)
+    bounds = np.linspace(0, rows, files + 1).astype(int)
+    paths = []
+    for i in range(files):
+        begin = max(bounds[i] - overlap, 0) if i > 0 else 0
+        suffix = '' if i == files - 1 else f'.{i:03d}'
+        path = os.path.join(directory, f'{basename}.csv{suffix}')
+        _write_stg_frame(path, df.iloc[begin:bounds[i + 1]], interval, target)
+        paths.append(path)
+    return paths
+
+
+def make_loaded_frame(rows: int, start: str = '2021-08-01', interval: int = 1,
+                      seed: int = 0) -> pd.DataFrame:
+    """読込後（read_stgの処理後）と同じ形式のDataFrameを作成する
+        CSVファイルを経由しないため、読込以外の処理のベンチマークに使う
+
+    Args:
+        rows (int): 行数
+        start (str): 開始日時
+        interval (int): 取得間隔（秒）
+        seed (int): 乱数のシード
+
+    Returns:
+        pd.DataFrame: 日時をインデックスとし、recv, send, delta_time の3カラムのDataFrame
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start=start, periods=rows, freq=f'{interval}S', name='date')
+    return pd.DataFrame({
+        'recv': rng.integers(0, 12_500_000 * interval, rows).astype(np.uint32),
+        'send': rng.integers(0, 1_250_000 * interval, rows).astype(np.uint32),
+        'delta_time': np.full(rows, interval, dtype=np.float32),
+    }, index=index)
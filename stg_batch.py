@@ -0,0 +1,341 @@
+"""STGのCSVファイルを読み込み、グラフ画像（PNG/SVG）とCSVファイルを出力する（GUIなし）
+    対象情報（1行目のTarget Address等）の異なるファイルを指定した場合は、対象ごとに
+    まとめてプロセスプールで並列に処理する
+
+    python stg_batch.py "logs/*.csv*" --mean-time 5分平均 --from 2021-08-01 --to 2021-08-31 \
+        --unit Mbps --scale 100M --format png csv --outdir out --jobs 4 --max-memory 1024
+"""
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+from typing import Optional
+
+import matplotlib
+import matplotlib.style
+
+matplotlib.use('Agg')  # 画面のない環境でも描画できるように、非対話型のバックエンドを使う
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from stg_core import (CSV_COMPRESSIONS, EXPORT_FORMATS,  # noqa: E402
+                      GAP_FACTOR, MAX_BPS, MEAN_TIMES, MEMORY_BUDGET,
+                      PLOT_BUCKETS_PER_PIXEL, STATS_THRESHOLD, ExecTime,
+                      PerfLog, StgCache, decimate_minmax, export_filename,
+                      export_frame, group_stg_files, load_stg_files,
+                      masked_message, now, perf, plot_graph, resample_df,
+                      scan_error_message, stats_filename, stats_text,
+                      target_names, throughput_stats, write_stats_csv)
+
+# 出力形式（画像の形式と、データの出力形式）
+IMAGE_FORMATS = ['png', 'svg']
+OUTPUT_FORMATS = IMAGE_FORMATS + list(EXPORT_FORMATS)
+# スケールの接頭辞と倍率
+SCALE_PREFIXES = {'k': int(1e3), 'M': int(1e6), 'G': int(1e9)}
+# 処理時間の集計項目
+STAGES = ['読込', '集計', '描画', '出力']
+
+
+def parse_mean_time(value: str) -> str:
+    """集計単位（MEAN_TIMESのキーまたは値）をMEAN_TIMESのキーに変換する"""
+    if value in MEAN_TIMES:
+        return value
+    for key, rule in MEAN_TIMES.items():
+        if rule == value:
+            return key
+    raise argparse.ArgumentTypeError(f'集計単位が正しくありません: {value}')
+
+
+def parse_bps(value: str, label: str) -> int:
+    """bps（k / M / G の接頭辞を付けられる）を返す"""
+    try:
+        if value[-1] in SCALE_PREFIXES:
+            bps = int(float(value[:-1]) * SCALE_PREFIXES[value[-1]])
+        else:
+            bps = int(value)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f'{label}が正しくありません: {value}')
+    if bps < 1:
+        raise argparse.ArgumentTypeError(f'{label}が正しくありません: {value}')
+    return bps
+
+
+def parse_scale(value: str):
+    """縦軸の高さ（auto または bps。k / M / G の接頭辞を付けられる）を返す"""
+    if value == 'auto':
+        return None
+    return parse_bps(value, '縦軸の高さ')
+
+
+def parse_threshold(value: str) -> int:
+    """スループット統計のしきい値（bps。k / M / G の接頭辞を付けられる）を返す"""
+    return parse_bps(value, 'しきい値')
+
+
+def parse_max_bps(value: str) -> int:
+    """ありえないとみなすスループット（bps。k / M / G の接頭辞を付けられる）を返す"""
+    return parse_bps(value, 'スループットの上限')
+
+
+def expand_filenames(patterns: list) -> list:
+    """ファイル名のパターン（ワイルドカード可）を展開し、重複を除いたファイル名のリストを返す"""
+    filenames = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+        for filename in matched:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def group_by_target(filenames: list) -> tuple:
+    """
+    ファイルを1行目の対象情報ごとにまとめ、読む順番に並べる（すべてのファイルを並列にチェックする）
+
+    Returns:
+        tuple: ({対象情報のtuple: ファイル名のリスト}, 読み込まないファイル名のリスト, エラーメッセージのリスト,
+                {ファイル名: StgFileInfo}）
+    """
+    (groups, skipped, errors, manifest) = group_stg_files(filenames)
+    return groups, skipped, [f'Error!：{scan_error_message(filename, err)}' for filename, err in errors], manifest
+
+
+def process_target(name: str, filenames: list, args: argparse.Namespace,
+                   max_workers: Optional[int] = None, progress=None, manifest: Optional[dict] = None) -> dict:
+    """
+    1つの対象のCSVファイルを読み込み、集計・描画・出力する（ワーカープロセスからも呼ばれる）
+
+    Args:
+        name (str): 出力ファイル名（拡張子なし）とグラフのタイトルに使う名前
+        filenames (list): CSVファイル名のリスト
+        args (argparse.Namespace): コマンドライン引数
+        max_workers (Optional[int]): CSVファイルを並列に読み込むプロセス数（1の場合は順に読み込む）
+        progress: 読込の経過を表示する関数
+        manifest (Optional[dict]): チェック済みのファイル情報（load_stg_filesのmanifest）
+
+    Returns:
+        dict: 名前、ファイル数、行数、処理ごとの時間（秒）、出力ファイル名、送受信の最大値
+    """
+    result = {'name': name, 'files': len(filenames), 'rows': 0,
+              'timings': dict.fromkeys(STAGES, 0.0), 'outputs': [], 'max': []}
+    perf.capture_next(args.profile)
+    with perf.operation('target', target=name):
+        t = ExecTime()
+
+        # CSVファイルの読込（メモリの目安がある場合は、その1/4ずつ読む省メモリ読込にする）
+        df = load_stg_files(
+            filenames,
+            cache=None if args.no_cache else StgCache(),
+            stream=args.stream or args.max_memory is not None,
+            progress=progress,
+            max_workers=max_workers,
+            memory_budget=MEMORY_BUDGET if args.max_memory is None else args.max_memory * 1024**2 // 4,
+            gap_factor=args.gap_factor,
+            max_bps=args.max_bps,
+            manifest=manifest,
+        )
+        result['rows'] = len(df)
+        result['masked'] = df.attrs['masked']
+        result['timings']['読込'] = t.laptime
+        if len(df) == 0:
+            raise ValueError('データがありません')
+
+        # 集計
+        date_from = args.date_from or str(df.index[0].date())
+        date_to = args.date_to or str(df.index[-1].date())
+        stats = throughput_stats(df, date_from, date_to, args.threshold)
+        result['stats'] = stats_text(stats)
+        (df, recv_unit, send_unit, axis_unit, div_unit, r_max, s_max) = resample_df(
+            df, MEAN_TIMES[args.mean_time], date_from, date_to, args.unit,
+        )
+        if len(df) == 0:
+            raise ValueError(f'{date_from} ～ {date_to} のデータがありません')
+        result['max'] = [r_max, s_max]
+        result['timings']['集計'] = t.laptime
+
+        # 出力
+        os.makedirs(args.outdir, exist_ok=True)
+        basename = os.path.join(args.outdir, f'{name}_{args.mean_time}')
+        for fmt in [fmt for fmt in args.format if fmt in EXPORT_FORMATS]:
+            filename = export_filename(basename, fmt, args.compression)
+            export_frame(df, ['delta_time', recv_unit, send_unit], filename, fmt,
+                         compression={'csv': args.compression, 'parquet': 'snappy'}.get(fmt),
+                         decimals=args.decimals)
+            result['outputs'].append(os.path.abspath(filename))
+            result['timings']['出力'] += t.laptime
+        if 'csv' in args.format:
+            write_stats_csv(stats, stats_filename(basename))
+            result['outputs'].append(os.path.abspath(stats_filename(basename)))
+
+        images = [fmt for fmt in args.format if fmt in IMAGE_FORMATS]
+        if images:
+            matplotlib.style.use('ggplot')
+            matplotlib.rc('font', family=args.font)
+            fig = Figure(figsize=args.size, dpi=args.dpi)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            # 描画する点数を画像の横幅に合わせて間引く（最大値の表示は間引く前の値）
+            width = args.size[0] * args.dpi
+            plot_graph(
+                decimate_minmax(df, [recv_unit, send_unit], int(width * PLOT_BUCKETS_PER_PIXEL)),
+                [recv_unit, send_unit],
+                title=f'{name} スループット（{args.mean_time}）',
+                axis_unit=axis_unit,
+                ylim_top=None if args.scale is None else args.scale // div_unit,
+                text=r_max + '\n' + s_max,
+                ax=ax,
+            )
+            fig.tight_layout()
+            result['timings']['描画'] = t.laptime
+            for fmt in images:
+                with perf.span('export', file=f'{basename}.{fmt}') as record:
+                    fig.savefig(f'{basename}.{fmt}', format=fmt)
+                    record['bytes'] = os.path.getsize(f'{basename}.{fmt}')
+                result['outputs'].append(os.path.abspath(f'{basename}.{fmt}'))
+            result['timings']['出力'] += t.laptime
+
+    return result
+
+
+def _process_target_traced(name: str, filenames: list, args: argparse.Namespace,
+                           max_workers: Optional[int] = None, manifest: Optional[dict] = None) -> dict:
+    """ワーカープロセスでprocess_targetを呼び出し、ワーカーの処理時間の記録を戻り値のperfに入れる"""
+    perf.clear()
+    result = process_target(name, filenames, args, max_workers, manifest=manifest)
+    result['perf'] = perf.records()
+    return result
+
+
+def print_summary(results: list, errors: dict, elapsed: float, jobs: int):
+    """対象ごとの処理時間の一覧を表示する"""
+    print(f'\n{"target":<24} {"files":>5} {"rows":>12} '
+          + ' '.join(f'{stage:>6}' for stage in STAGES) + f' {"total":>8}')
+    for result in sorted(results, key=lambda r: r['name']):
+        timings = result['timings']
+        print(f'{result["name"]:<24} {result["files"]:>5} {result["rows"]:>12,} '
+              + ' '.join(f'{timings[stage]:>8.3f}' for stage in STAGES)
+              + f' {sum(timings.values()):>8.3f}')
+    for name, err in sorted(errors.items()):
+        print(f'{name:<24} Error!：{err}')
+    busy = sum(sum(result['timings'].values()) for result in results)
+    print(f'経過時間: {elapsed:.3f} sec（並列数: {jobs}、処理時間の合計: {busy:.3f} sec）')
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('files', nargs='+', help='STGのCSVファイル（ワイルドカード可）')
+    parser.add_argument('--mean-time', type=parse_mean_time, default='1分平均',
+                        help='集計単位（例: 1分平均, 1T）')
+    parser.add_argument('--from', dest='date_from', help='開始日（YYYY-MM-DD、省略時は最初の日）')
+    parser.add_argument('--to', dest='date_to', help='終了日（YYYY-MM-DD、省略時は最後の日）')
+    parser.add_argument('--unit', choices=['bps', 'kbps', 'Mbps', 'Gbps'], default='Mbps', help='縦軸の単位')
+    parser.add_argument('--scale', type=parse_scale, default=None,
+                        help='縦軸の高さ（auto または bps。例: 100M, 1G。省略時はauto）')
+    parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=['png'], help='出力形式')
+    parser.add_argument('--compression', choices=[c for c in CSV_COMPRESSIONS if c is not None], default=None,
+                        help='CSVファイルの圧縮方式（zstdはzstandardパッケージが必要）')
+    parser.add_argument('--decimals', type=int, default=None,
+                        help='csv / parquet / featherの小数点以下の桁数（省略時は丸めない）')
+    parser.add_argument('--outdir', default='.', help='出力先ディレクトリ')
+    parser.add_argument('--size', type=float, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+                        default=matplotlib.rcParams['figure.figsize'], help='グラフのサイズ（インチ）')
+    parser.add_argument('--dpi', type=float, default=matplotlib.rcParams['figure.dpi'], help='グラフの解像度')
+    parser.add_argument('--font', default='meiryo', help='グラフのフォント')
+    parser.add_argument('--stream', action='store_true', help='省メモリ読込')
+    parser.add_argument('--no-cache', action='store_true', help='読込キャッシュを使わない')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='対象を並列に処理するプロセス数')
+    parser.add_argument('--max-memory', type=int, default=None,
+                        help='1対象の処理で使うメモリの目安（MB、指定すると省メモリ読込にする）')
+    parser.add_argument('--threshold', type=parse_threshold, default=STATS_THRESHOLD,
+                        help=f'スループット統計のしきい値（例: 500M。省略時は{STATS_THRESHOLD / 1e6:g}M）')
+    parser.add_argument('--gap-factor', type=float, default=GAP_FACTOR,
+                        help=f'取得間隔の中央値の何倍を超えたら欠測として除外するか（省略時は{GAP_FACTOR:g}）')
+    parser.add_argument('--max-bps', type=parse_max_bps, default=MAX_BPS,
+                        help=f'ありえないとみなして除外するスループット（例: 10G。省略時は{MAX_BPS / 1e9:g}G）')
+    parser.add_argument('--perf-log', metavar='FILE', default=None,
+                        help='処理ごとの実行時間・行数・バイト数をJSONファイルに保存する')
+    parser.add_argument('--profile', choices=PerfLog.PROFILE_MODES, default=None,
+                        help='対象ごとの処理のプロファイルを--perf-logに記録する')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = make_parser().parse_args(argv)
+
+    filenames = expand_filenames(args.files)
+    if len(filenames) == 0:
+        print('Error!：CSVファイルがありません', file=sys.stderr)
+        return 1
+
+    # CSVファイルのチェックと、対象情報ごとのまとめ
+    groups, skipped, header_errors, manifest = group_by_target(filenames)
+    for message in header_errors:
+        print(message, file=sys.stderr)
+    for filename in skipped:
+        print(f'ほかのファイルと重複するため読み込みません: "{filename}"')
+    if len(groups) == 0:
+        return 1
+    names = target_names(list(groups))
+
+    print(f'{now()} 処理開始（{len(filenames)} files, {len(groups)} targets）')
+    t = ExecTime()
+    results = []
+    errors = {}
+    if len(groups) == 1:
+        # 対象が1つの場合は、CSVファイルをプロセスプールで並列に読み込む
+        [(target, target_files)] = groups.items()
+        try:
+            results.append(process_target(names[target], target_files, args, progress=sys.stdout.write,
+                                          manifest=manifest))
+        except (ValueError, MemoryError, ImportError) as err:
+            errors[names[target]] = err
+    else:
+        # 対象ごとにプロセスプールで並列に処理する（各ワーカーはCSVファイルを順に読み込む）
+        jobs = max(1, min(args.jobs, len(groups)))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(_process_target_traced, names[target], target_files, args, 1,
+                                {filename: manifest[filename] for filename in target_files}): names[target]
+                for target, target_files in groups.items()
+            }
+            for count, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except concurrent.futures.process.BrokenProcessPool:
+                    err = 'ワーカープロセスが異常終了しました（メモリ不足の可能性があります）'
+                    errors[name] = err
+                    print(f' [{count}/{len(futures)}] {name} ... Error!：{err}')
+                    continue
+                except Exception as err:
+                    errors[name] = err
+                    print(f' [{count}/{len(futures)}] {name} ... Error!：{err}')
+                    continue
+                perf.extend(result.pop('perf'))
+                results.append(result)
+                print(f' [{count}/{len(futures)}] {name} ... {sum(result["timings"].values()):.3f} sec')
+
+    for result in sorted(results, key=lambda r: r['name']):
+        print(f'\n{result["name"]}')
+        for text in result['max']:
+            print(f' {text}')
+        print(f' {masked_message(result["masked"])}')
+        for text in result['stats']:
+            print(f' {text}')
+        for output in result['outputs']:
+            print(f' "{output}"')
+    print_summary(results, errors, t.laptime, 1 if len(groups) == 1 else jobs)
+    if args.perf_log is not None:
+        perf.to_json(args.perf_log)
+        print(f'処理時間の記録: "{os.path.abspath(args.perf_log)}"')
+    print(f'{now()} 処理完了')
+
+    return 1 if header_errors or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
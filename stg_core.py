@@ -0,0 +1,2428 @@
+"""STG Graph Plotの読込・集計・描画の処理（GUIに依存しない部分）
+
+tkinterをimportしないため、GUIのない環境（バッチ処理、ベンチマーク）からも利用できる。
+"""
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import cProfile
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from typing import Optional
+
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.ticker import AutoMinorLocator, FuncFormatter
+from pandas.tseries.frequencies import to_offset
+
+# 集計単位の選択肢
+MEAN_TIMES = {
+    '生データ': 'org',
+    '10秒平均': '10S',
+    '15秒平均': '15S',
+    '30秒平均': '30S',
+    '1分平均': '1T',
+    '2分平均': '2T',
+    '5分平均': '5T',
+    '10分平均': '10T',
+    '15分平均': '15T',
+    '30分平均': '30T',
+    '1時間平均': '1H',
+    '3時間平均': '3H',
+    '6時間平均': '6H',
+    '12時間平均': '12H',
+    '1日平均': '1D',
+}
+
+
+# CSVファイル読込の並列数（Noneの場合はCPUコア数）
+MAX_WORKERS = None
+
+# 読込キャッシュの保存先と上限サイズ（バイト）
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.stg_graph_plot', 'cache')
+CACHE_MAX_BYTES = 2 * 1024**3
+
+# 計算結果（集計単位・期間ごとのスループット）のキャッシュ件数
+VIEW_CACHE_SIZE = 16
+
+# グラフ描画時の間引き（横幅1ピクセルあたりの区間数。区間ごとに最小値・最大値を残す）
+PLOT_BUCKETS_PER_PIXEL = 1
+
+# ファイルのチェック（ヘッダと最初・最後の日時の読込）で、1行として読む最大のバイト数と
+# ファイルの末尾から読むバイト数、並列に読むスレッド数
+SCAN_LINE_BYTES = 1024
+SCAN_TAIL_BYTES = 4096
+SCAN_WORKERS = 16
+
+# ファイル出力の形式と拡張子（CSVは圧縮方式の拡張子を後ろに付ける）
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+# CSVファイルの圧縮方式と拡張子
+CSV_COMPRESSIONS = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+# ファイル出力で一度に書き出す行数
+EXPORT_CHUNK_ROWS = 50_000
+
+# 処理時間の記録件数（超えたら古いものから削除する）
+PERF_LOG_SIZE = 5000
+# 1回の処理のプロファイル（cProfile / tracemalloc）で記録する上位の件数
+PROFILE_TOP = 30
+
+# 除外する行の判定（mask_invalid_rows）
+# 取得間隔の中央値の何倍を超える間隔を欠測とみなすかと、ありえないスループット（bps）
+GAP_FACTOR = 5
+MAX_BPS = 100e9
+# スループット統計（throughput_stats）のパーセンタイルとピークを求める平均の区切り、
+# パーセンタイル、しきい値（bps）の既定値
+STATS_WINDOW = '5T'
+STATS_PERCENTILES = [50, 95, 99]
+STATS_THRESHOLD = 100e6
+
+# 追記分の判定で取得間隔の中央値を求める、読込済みの末尾の行数
+APPEND_INTERVAL_ROWS = 10_000
+# 日時順に結合する値の列と、集計（リサンプル）で合計する列
+STG_VALUE_COLUMNS = ['uptime', 'recv', 'send']
+SUM_COLUMNS = ['recv', 'send', 'delta_time']
+
+# 省メモリ読込で使うメモリの目安（バイト）と、読込中の1行あたりのバイト数の見積り
+MEMORY_BUDGET = 256 * 1024**2
+STREAM_ROW_BYTES = 256
+
+# STGの日時フォーマットの候補（秒の後ろにミリ秒が付く場合も判定する）
+STG_DATE_FORMATS = [
+    '%d %b %Y %H:%M:%S',
+    '%d-%b-%Y %H:%M:%S',
+    '%d/%b/%Y %H:%M:%S',
+    '%b %d %Y %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%d.%m.%Y %H:%M:%S',
+]
+# 固定長で一括変換できる書式指定子と桁数（%fは末尾の残り桁数）
+FIXED_WIDTH_DIRECTIVES = {'d': 2, 'm': 2, 'Y': 4, 'H': 2, 'M': 2, 'S': 2, 'b': 3}
+# 月の略称と月の値（STGのバグでAugがAvgになっている）
+MONTH_ABBRS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Avg': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+
+def now(format: str = '%Y-%m-%d %H:%M:%S') -> str:
+    """現在時刻文字列を返す
+    """
+    return datetime.datetime.now().strftime(format)
+
+
+class ExecTime():
+    """コマンドの実行時間を測定する"""
+    def __init__(self, init_time=0):
+        self.t1 = time.time() if init_time == 0 else init_time
+
+    @property
+    def laptime(self):
+        t2 = time.time()
+        result = t2 - self.t1
+        self.t1 = t2
+        return result
+
+    @property
+    def print(self):
+        print(f'{self.laptime:.3f} sec')
+
+
+class PerfLog():
+    """処理ごとの実行時間の記録
+        spanで囲んだ区間の名前・開始日時・実行時間・行数・バイト数などを
+        リングバッファ（maxlen件）に記録する。どのスレッドからでも記録できる。
+        capture_nextでプロファイルの種類を指定すると、次のoperationの1回だけ
+        cProfileまたはtracemallocの結果を記録に付ける
+    """
+    PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+    def __init__(self, maxlen: int = PERF_LOG_SIZE):
+        self._records = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # スレッドごとの実行中の区間の名前
+        self._profile = None
+
+    @contextlib.contextmanager
+    def span(self, name: str, rows: Optional[int] = None, nbytes: Optional[int] = None, **info):
+        """
+        withで囲んだ区間の実行時間を記録する
+        区間の中で行数などが分かる場合は、yieldした辞書のrows、bytesに設定する
+
+        Args:
+            name (str): 区間の名前（'read_csv'、'resample'など）
+            rows (Optional[int]): 行数
+            nbytes (Optional[int]): バイト数
+            info: 記録に追加する項目（ファイル名、集計単位など）
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        record = {
+            'name': name,
+            'parent': stack[-1] if stack else None,
+            'start': time.time(),
+            'seconds': None,
+            'rows': rows,
+            'bytes': nbytes,
+            'thread': threading.current_thread().name,
+            'pid': os.getpid(),
+            **info,
+        }
+        stack.append(name)
+        t = time.perf_counter()
+        try:
+            yield record
+        except BaseException as err:
+            record['error'] = type(err).__name__
+            raise
+        finally:
+            record['seconds'] = time.perf_counter() - t
+            stack.pop()
+            with self._lock:
+                self._records.append(record)
+
+    def capture_next(self, mode: Optional[str]):
+        """次のoperationの1回だけプロファイルを記録する（Noneで取り消す）
+
+        Args:
+            mode (Optional[str]): 'cprofile' または 'tracemalloc'
+        """
+        if mode is not None and mode not in self.PROFILE_MODES:
+            raise ValueError(f'プロファイルの種類が不正です: {mode}')
+        self._profile = mode
+
+    @contextlib.contextmanager
+    def operation(self, name: str, **info):
+        """
+        ボタン・メニュー・バッチの1回の処理を記録する（spanと同じ）
+        capture_nextが指定されていれば、この処理のプロファイルを記録に付ける
+        （cProfileは呼び出したスレッドだけ、tracemallocはプロセス全体を対象とする）
+        """
+        with self._lock:
+            mode, self._profile = self._profile, None
+        with self.span(name, **info) as record:
+            if mode is None:
+                yield record
+                return
+            record['profile_mode'] = mode
+            if mode == 'cprofile':
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield record
+                finally:
+                    profile.disable()
+                    out = io.StringIO()
+                    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+                    record['profile'] = out.getvalue()
+            else:
+                started = not tracemalloc.is_tracing()
+                if started:
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+                before = tracemalloc.take_snapshot()
+                try:
+                    yield record
+                finally:
+                    after = tracemalloc.take_snapshot()
+                    (current, peak) = tracemalloc.get_traced_memory()
+                    if started:
+                        tracemalloc.stop()
+                    stats = after.compare_to(before, 'lineno')[:PROFILE_TOP]
+                    record['peak_bytes'] = peak
+                    record['profile'] = '\n'.join(str(stat) for stat in stats)
+
+    @property
+    def profile_mode(self) -> Optional[str]:
+        """capture_nextで指定したプロファイルの種類（次のoperationで記録したらNoneに戻る）"""
+        return self._profile
+
+    def extend(self, records: list):
+        """他のプロセス（プロセスプールのワーカー）の記録を追加する"""
+        with self._lock:
+            self._records.extend(records)
+
+    def records(self) -> list:
+        """記録のリストを古い順に返す"""
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self) -> list:
+        """区間の名前ごとの回数・合計時間・最大時間・行数・バイト数を、合計時間の長い順に返す"""
+        totals = {}
+        for record in self.records():
+            total = totals.setdefault(record['name'], {
+                'name': record['name'], 'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'bytes': 0,
+            })
+            total['count'] += 1
+            total['seconds'] += record['seconds']
+            total['max_seconds'] = max(total['max_seconds'], record['seconds'])
+            total['rows'] += record['rows'] or 0
+            total['bytes'] += record['bytes'] or 0
+        return sorted(totals.values(), key=lambda total: total['seconds'], reverse=True)
+
+    def to_json(self, filename: Optional[str] = None) -> str:
+        """記録と集計をJSONの文字列で返す（filenameを指定した場合はファイルにも保存する）"""
+        text = json.dumps({'summary': self.summary(), 'records': self.records()},
+                          ensure_ascii=False, indent=1, default=str)
+        if filename is not None:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+
+# 処理時間の記録（モジュール全体で共有する）
+perf = PerfLog()
+
+
+
+def guess_stg_date_format(text: str) -> Optional[str]:
+    """日時文字列に一致するフォーマットをSTG_DATE_FORMATSから探す
+
+    Args:
+        text (str): 日時文字列（Avgは置換済みであること）
+
+    Returns:
+        Optional[str]: 一致したフォーマット、一致しなければNone
+    """
+    for base in STG_DATE_FORMATS:
+        for fmt in (base, base + '.%f'):
+            try:
+                datetime.datetime.strptime(text.strip(), fmt)
+            except ValueError:
+                continue
+            return fmt
+    return None
+
+
+def _parse_fixed_width_date(dates: pd.Series, fmt: str) -> Optional[np.ndarray]:
+    """固定長の日時文字列をNumPyの配列演算で一括変換する
+        文字列をバイト列の2次元配列とみなし、各フィールドの桁を数値に変換する
+        月の略称はAvgもAugとして扱う
+
+    Args:
+        dates (pd.Series): 日時文字列のSeries
+        fmt (str): 日時フォーマット
+
+    Returns:
+        Optional[np.ndarray]: datetime64[ns]の配列（変換できない行はNaT）、
+            固定長で扱えない場合はNone
+    """
+    try:
+        raw = dates.to_numpy(dtype=object).astype('S')
+    except UnicodeEncodeError:
+        return None
+    width = raw.dtype.itemsize
+    if len(raw) == 0 or width == 0:
+        return None
+    mat = raw.view(np.uint8).reshape(len(raw), width)
+
+    # フォーマットから各フィールドの位置を求め、区切り文字を照合する
+    ok = np.ones(len(raw), dtype=bool)
+    fields = {}
+    pos = 0
+    for token in re.findall(r'%.|[^%]+', fmt):
+        if token == '%f':
+            n = width - pos
+            if not 0 < n <= 9:
+                return None
+            fields['f'] = (pos, n)
+        elif token.startswith('%'):
+            n = FIXED_WIDTH_DIRECTIVES.get(token[1])
+            if n is None:
+                return None
+            fields[token[1]] = (pos, n)
+        else:
+            literal = np.frombuffer(token.encode('ascii'), dtype=np.uint8)
+            n = len(literal)
+            if pos + n > width:
+                return None
+            ok &= (mat[:, pos:pos+n] == literal).all(axis=1)
+        pos += n
+    if pos != width or not {'Y', 'd', 'H', 'M', 'S'} <= fields.keys():
+        return None
+    if ok.mean() < 0.5:  # 長さの異なる行が多い場合は固定長とみなさない
+        return None
+
+    def number(key):
+        start, n = fields[key]
+        digits = mat[:, start:start+n].astype(np.int64) - ord('0')
+        ok[...] &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        return digits @ (10 ** np.arange(n - 1, -1, -1, dtype=np.int64))
+
+    if 'b' in fields:
+        start, _ = fields['b']
+        codes = (mat[:, start].astype(np.int64) << 16) | (mat[:, start+1].astype(np.int64) << 8) \
+            | mat[:, start+2].astype(np.int64)
+        keys = np.array([(ord(a) << 16) | (ord(b) << 8) | ord(c) for a, b, c in MONTH_ABBRS])
+        values = np.array(list(MONTH_ABBRS.values()))
+        order = np.argsort(keys)
+        idx = np.searchsorted(keys[order], codes).clip(0, len(keys) - 1)
+        ok &= keys[order][idx] == codes
+        month = values[order][idx]
+    elif 'm' in fields:
+        month = number('m')
+    else:
+        return None
+    year = number('Y')
+    day = number('d')
+    hour = number('H')
+    minute = number('M')
+    second = number('S')
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    ok &= (hour < 24) & (minute < 60) & (second < 60) & (year >= 1970) & (year < 2200)
+
+    # 年月をdatetime64[M]、日以下を経過時間として組み立てる
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0)
+    epoch_days = months.astype('M8[M]').astype('M8[D]').astype(np.int64) + np.where(ok, day - 1, 0)
+    seconds = epoch_days * 86400 + hour * 3600 + minute * 60 + second
+    result = np.where(ok, seconds, 0) * 10**9
+    if 'f' in fields:
+        result += number('f') * 10**(9 - fields['f'][1])
+    # 月末を超える日付（2/30など）は不正とする
+    ok &= result.view('M8[ns]').astype('M8[M]').astype(np.int64) == months
+    result[~ok] = np.iinfo(np.int64).min  # NaT
+    return result.view('M8[ns]')
+
+
+def parse_stg_date(dates: pd.Series) -> pd.Series:
+    """STGの日時文字列をdatetime64に変換する
+        先頭の値からフォーマットを決めて一括変換し、変換できなかった行だけ
+        フォーマット推定で変換し直す。それでも変換できない行はNaTになる
+        固定長の文字列はNumPyで一括変換し、それ以外はpandasで変換する
+
+    Args:
+        dates (pd.Series): 日時文字列のSeries
+
+    Returns:
+        pd.Series: datetime64のSeries
+    """
+    sample = dates.head(1000).dropna()
+    if len(sample) == 0:
+        sample = dates.dropna()
+    # STGのバグでAugがAvgになっているので置換してから判定する
+    fmt = guess_stg_date_format(sample.iat[0].replace('Avg', 'Aug')) if len(sample) > 0 else None
+
+    values = _parse_fixed_width_date(dates, fmt) if fmt is not None else None
+    if values is None:
+        result = pd.to_datetime(dates.str.replace('Avg', 'Aug', regex=False), format=fmt, errors='coerce')
+    else:
+        result = pd.Series(values, index=dates.index)
+
+    # フォーマットに一致しなかった行を個別に変換する
+    failed = result.isna()
+    if failed.any():
+        retry = dates[failed].dropna().str.replace('Avg', 'Aug', regex=False)
+        result[retry.index] = pd.to_datetime(retry, errors='coerce')
+    return result
+
+
+class StgCache():
+    """読込済みCSVファイルのキャッシュ
+        日時変換とuptimeが0の行の削除を済ませたデータを、
+        列ごとのバイナリ（NumPyのnpz形式）で保存する。
+        元ファイルのサイズと更新日時が一致すれば再利用し、一致しなければ作り直す。
+        合計サイズが上限を超えたら、最後に使われた日時が古いものから削除する（LRU）
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, filename: str) -> str:
+        """元ファイルのフルパスからキャッシュファイル名を作る"""
+        key = os.path.normcase(os.path.abspath(filename)).encode('utf-8')
+        return os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest() + '.npz')
+
+    def load(self, filename: str, stat: os.stat_result) -> Optional[pd.DataFrame]:
+        """キャッシュを読み込む
+
+        Args:
+            filename (str): 元のCSVファイル名
+            stat (os.stat_result): 元ファイルの情報
+
+        Returns:
+            Optional[pd.DataFrame]: キャッシュが有効ならDataFrame、無効ならNone
+        """
+        path = self._path(filename)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                if int(npz['size']) != stat.st_size or int(npz['mtime_ns']) != stat.st_mtime_ns:
+                    return None
+                df = pd.DataFrame({
+                    'date': npz['date'].view('M8[ns]'),
+                    'uptime': npz['uptime'],
+                    'recv': npz['recv'],
+                    'send': npz['send'],
+                })
+        except (OSError, KeyError, ValueError):
+            return None
+        try:
+            os.utime(path)  # LRU用に最終使用日時を更新する
+        except OSError:
+            pass  # 読込後に他のプロセスが削除した（読み込んだデータはそのまま使う）
+        return df
+
+    def save(self, filename: str, df: pd.DataFrame, stat: os.stat_result):
+        """キャッシュを保存する
+
+        Args:
+            filename (str): 元のCSVファイル名
+            df (pd.DataFrame): 読込済みのDataFrame（date, uptime, recv, send）
+            stat (os.stat_result): 読込前に取得した元ファイルの情報
+        """
+        path = self._path(filename)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    date=df['date'].to_numpy(dtype='M8[ns]').view(np.int64),
+                    uptime=df['uptime'].to_numpy(),
+                    recv=df['recv'].to_numpy(),
+                    send=df['send'].to_numpy(),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _entries(self) -> list:
+        """キャッシュファイルの(パス, ファイル情報)の一覧を最後に使われた日時の新しい順に返す"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.npz'):
+                        continue
+                    try:
+                        entries.append((entry.path, entry.stat()))
+                    except OSError:
+                        pass  # 他のプロセスが削除した
+        except OSError:
+            return []
+        return sorted(entries, key=lambda e: e[1].st_mtime, reverse=True)
+
+    def evict(self, max_bytes: Optional[int] = None):
+        """合計サイズが上限以下になるまで古いキャッシュを削除する
+            （複数のプロセスから同時に呼ばれても、削除済みのファイルは無視する）
+
+        Args:
+            max_bytes (Optional[int]): 上限サイズ（Noneの場合はself.max_bytes）
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = 0
+        for path, stat in self._entries():
+            total += stat.st_size
+            if total > max_bytes:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """すべてのキャッシュを削除する"""
+        self.evict(max_bytes=0)
+
+
+def _clean_stg_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """読み込んだCSVの日時を変換し、不要な行を削除する
+        uptimeの列は再起動の判定（mask_invalid_rows）に使うため残す
+
+    Args:
+        df (pd.DataFrame): date, uptime, recv, send の4カラムのDataFrame
+
+    Returns:
+        pd.DataFrame: date, uptime, recv, send の4カラムのDataFrame
+    """
+    # 日時に変換し、変換できなかった行は削除する
+    with perf.span('date_parse', rows=len(df)):
+        df['date'] = parse_stg_date(df['date'])
+    df.dropna(subset=['date'], inplace=True)
+    # uptimeが0の行は読み取り失敗のため削除する
+    df.drop(df.query('uptime == 0').index, inplace=True)
+    return df
+
+
+def _parse_stg_header(line: str, filename: str) -> list:
+    """
+    STGのCSVファイルの1行目の文字列をチェックし、対象情報（Target Address以降の4項目）を返す
+
+    Args:
+        line (str): 1行目の文字列（末尾の改行を除いたもの）
+        filename (str): CSVファイル名（エラーメッセージ用）
+
+    Raises:
+        ValueError: STGのCSVファイルではない
+
+    Returns:
+        list: 対象情報（'Target Address:...', 'OID:...', 'Interval:...', 'ifIndex:...'）
+    """
+    # 行頭がSTGでカンマ区切りで5カラムあり、2カラム目がターゲットアドレスであること
+    columns = line.split(',')
+    if line.startswith('STG') is False or len(columns) != 5:
+        raise ValueError(f'STGのCSVファイルではありません\n{filename}')
+    if not re.match('Target Address:(.+)', columns[1]):
+        raise ValueError(f'STGのCSVファイルではありません\n{filename}')
+    return columns[1:]
+
+
+class StgFileInfo():
+    """CSVファイルのチェック結果（scan_stg_filesの戻り値の要素）
+    """
+    def __init__(self, filename: str, target: tuple, size: int, first: pd.Timestamp, last: pd.Timestamp):
+        self.filename = filename
+        self.target = target  # 対象情報（_parse_stg_headerの戻り値のtuple）
+        self.size = size      # ファイルサイズ（バイト）
+        self.first = first    # 最初の行の日時（行がない場合・変換できない場合はNaT）
+        self.last = last      # 最後の行の日時（同上）
+
+    def __repr__(self):
+        return f'StgFileInfo({self.filename!r}, {self.first} ～ {self.last}, {self.size:,} bytes)'
+
+
+def _scan_stg_file(filename: str) -> tuple:
+    """
+    CSVファイルの先頭の3行と末尾だけを読み、(対象情報, サイズ, 最初の行の日時の文字列, 最後の行の日時の文字列)を返す
+    日時の文字列は変換しない（scan_stg_filesでまとめて変換する）。行がない場合はNone
+    """
+    with open(filename, 'rb') as f:
+        header = f.readline(SCAN_LINE_BYTES)
+        f.readline(SCAN_LINE_BYTES)  # 列名の行
+        head_end = f.tell()
+        first_line = f.readline(SCAN_LINE_BYTES)
+        size = os.fstat(f.fileno()).st_size
+        # 末尾を読み、改行で終わる最後の行（書き込み途中の行は除く）を取り出す
+        start = max(head_end, size - SCAN_TAIL_BYTES)
+        f.seek(start)
+        tail = f.read(size - start)
+    target = tuple(_parse_stg_header(header.decode('utf-8').rstrip(), filename))
+    lines = tail.split(b'\n')
+    complete = [line for line in lines[(1 if start > head_end else 0):-1] if line.strip()]
+    last_line = complete[-1] if complete else lines[-1]
+    first = first_line.split(b',', 1)[0].decode('ascii', 'replace').strip() if first_line.strip() else None
+    last = last_line.split(b',', 1)[0].decode('ascii', 'replace').strip() if last_line.strip() else None
+    return (target, size, first, last)
+
+
+def scan_stg_files(filenames: list, max_workers: int = SCAN_WORKERS) -> tuple:
+    """
+    CSVファイルの1行目（対象情報）と最初・最後の日時を、全件まとめて並列にチェックする
+    ファイルの先頭と末尾の数KBだけを読むため、ファイル数が多くても短時間で終わる
+
+    Args:
+        filenames (list): CSVファイル名のリスト
+        max_workers (int): 並列に読むスレッド数
+
+    Returns:
+        tuple: (StgFileInfoのリスト（filenamesの順）, エラーの(ファイル名, 例外)のリスト)
+            例外はUnicodeDecodeError（文字コードがUTF-8ではない）、OSError（ファイルが開けない）、
+            ValueError（STGのCSVファイルではない）
+    """
+    with perf.span('scan', rows=len(filenames)) as record:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_scan_stg_file, filename) for filename in filenames]
+        scanned = []
+        errors = []
+        for filename, future in zip(filenames, futures):
+            try:
+                scanned.append((filename, future.result()))
+            except (UnicodeDecodeError, OSError, ValueError) as err:
+                errors.append((filename, err))
+        # 日時はまとめて変換する
+        texts = [text for _, (_, _, first, last) in scanned for text in (first, last)]
+        dates = parse_stg_date(pd.Series(texts, dtype=object)) if texts else pd.Series([], dtype='M8[ns]')
+        infos = [
+            StgFileInfo(filename, target, size, dates.iat[2*i], dates.iat[2*i+1])
+            for i, (filename, (target, size, _, _)) in enumerate(scanned)
+        ]
+        record['bytes'] = sum(info.size for info in infos)
+    return (infos, errors)
+
+
+def plan_stg_reads(infos: list) -> tuple:
+    """
+    同じ対象のCSVファイルを読む順番（最初の日時の順）に並べ、ほかのファイルに含まれるファイルを除く
+    最初から最後の日時の範囲がほかのファイルの範囲に含まれ、サイズもそのファイル以下の場合は、
+    ローテーションの重複（同じ内容のコピーなど）とみなして読み込まない
+
+    Args:
+        infos (list): StgFileInfoのリスト（scan_stg_filesの戻り値）
+
+    Returns:
+        tuple: (読み込むファイル名のリスト, 読み込まないファイル名のリスト)
+    """
+    # 日時とサイズは一度だけint64の配列にする（NaTはint64の最小値）
+    first = np.array([info.first.value for info in infos], dtype=np.int64)
+    last = np.array([info.last.value for info in infos], dtype=np.int64)
+    size = np.array([info.size for info in infos], dtype=np.int64)
+    valid = (first != pd.NaT.value) & (last != pd.NaT.value)
+    # 最初の日時の順（同じ場合はサイズの大きい順）に並べ、行のないファイルは最後にする
+    order = np.lexsort((-size, np.where(valid, first, np.iinfo(np.int64).max)))
+    # 先に読むファイルは最初の日時が同じか前なので、最後の日時とサイズが同じか大きければ含んでいる
+    # （行のないファイルの最後の日時はint64の最小値なので、ほかのファイルを含むことはない）
+    read_last = np.empty(len(infos), dtype=np.int64)
+    read_size = np.empty(len(infos), dtype=np.int64)
+    count = 0
+    reads = []
+    skipped = []
+    for i in order:
+        if valid[i] and np.any((read_last[:count] >= last[i]) & (read_size[:count] >= size[i])):
+            skipped.append(infos[i].filename)
+            continue
+        read_last[count] = last[i]
+        read_size[count] = size[i]
+        count += 1
+        reads.append(infos[i].filename)
+    return (reads, skipped)
+
+
+def group_stg_files(filenames: list, max_workers: int = SCAN_WORKERS) -> tuple:
+    """
+    CSVファイルをチェックし、対象情報ごとに読む順番に並べる（plan_stg_readsを参照）
+
+    Args:
+        filenames (list): CSVファイル名のリスト
+        max_workers (int): 並列に読むスレッド数
+
+    Returns:
+        tuple: ({対象情報のtuple: 読み込むファイル名のリスト}, 読み込まないファイル名のリスト,
+                エラーの(ファイル名, 例外)のリスト, {ファイル名: StgFileInfo}（load_stg_filesのmanifest）)
+    """
+    (infos, errors) = scan_stg_files(filenames, max_workers)
+    manifest = {info.filename: info for info in infos}
+    by_target = {}
+    for info in infos:
+        by_target.setdefault(info.target, []).append(info)
+    groups = {}
+    skipped = []
+    for target, target_infos in by_target.items():
+        (groups[target], target_skipped) = plan_stg_reads(target_infos)
+        skipped += target_skipped
+    return (groups, skipped, errors, manifest)
+
+
+def scan_error_message(filename: str, err: Exception) -> str:
+    """scan_stg_filesのエラーのメッセージを返す"""
+    if isinstance(err, UnicodeDecodeError):
+        return f'文字コードがUTF-8ではありません\n  {filename}\n  {err}'
+    if isinstance(err, ValueError):
+        return str(err).replace('\n', '\n  ')
+    return f'ファイルが開けません\n  {filename}\n  {err}'
+
+
+def target_address(target: list) -> str:
+    """対象情報（_parse_stg_headerの戻り値）からターゲットアドレスを返す"""
+    return re.match('Target Address:(.+)', target[0]).group(1)
+
+
+def read_stg_file(filename: str, cache: Optional[StgCache] = None) -> pd.DataFrame:
+    """STGのCSVファイルを1つ読み込む
+        プロセスプールのワーカーから呼び出すため、モジュールレベルの関数とする
+        キャッシュが有効な場合はCSVファイルを読まずにキャッシュを返す
+
+    Args:
+        filename (str): CSVファイル名
+        cache (Optional[StgCache]): 読込キャッシュ（Noneの場合は使わない）
+
+    Returns:
+        pd.DataFrame: date, uptime, recv, send の4カラムのDataFrame
+            attrs['cached'] はキャッシュから読み込んだかどうか、
+            attrs['state'] は追記分の読込（read_stg_tail）に渡す読込位置
+    """
+    stat = os.stat(filename)  # 読込中に追記されても次回読み直されるよう先に取得する
+    df = None
+    if cache is not None:
+        with perf.span('cache_load', file=filename) as record:
+            df = cache.load(filename, stat)
+            record['rows'] = None if df is None else len(df)
+    if df is None:
+        with perf.span('read_csv', nbytes=stat.st_size, file=filename) as record:
+            df = pd.read_csv(
+                filename,
+                encoding='SHIFT-JIS',                       # 文字コードを指定
+                header=1,                                   # 0行目（最初の行）を読み飛ばす
+                names=['date', 'uptime', 'recv', 'send'],   # カラム名を設定
+            )
+            record['rows'] = len(df)
+        df = _clean_stg_frame(df)
+        if cache is not None:
+            cache.save(filename, df, stat)
+        df.attrs['cached'] = False
+    else:
+        df.attrs['cached'] = True
+    df.attrs['state'] = (stat.st_ino, stat.st_size)
+    return df
+
+
+def read_stg_tail(filename: str, state: Optional[tuple] = None) -> tuple:
+    """STGのCSVファイルの追記分だけを読み込む
+        前回の読込位置から末尾の改行までを読み込む。ファイルが入れ替わった
+        （ローテーションされた）場合や縮んだ場合は先頭から読み込む
+
+    Args:
+        filename (str): CSVファイル名
+        state (Optional[tuple]): 前回の読込位置 (inode, バイト数)
+
+    Returns:
+        tuple: (date, uptime, recv, send の4カラムのDataFrame, 新しい読込位置)
+    """
+    stat = os.stat(filename)
+    offset = 0
+    if state is not None and state[0] == stat.st_ino and state[1] <= stat.st_size:
+        offset = state[1]
+
+    with open(filename, 'rb') as f:
+        # 読込位置が行の途中の場合は行頭まで戻る（読込済みの行は日時で除外される）
+        if offset > 0:
+            start = max(0, offset - 4096)
+            f.seek(start)
+            offset = start + f.read(offset - start).rfind(b'\n') + 1
+        f.seek(offset)
+        data = f.read()
+    # 書き込み途中の最終行は次回読み込む
+    data = data[:data.rfind(b'\n') + 1]
+    new_state = (stat.st_ino, offset + len(data))
+    if offset == 0:
+        data = b''.join(data.split(b'\n', 2)[2:])  # ヘッダの2行を読み飛ばす
+
+    names = ['date', 'uptime', 'recv', 'send']
+    if data.strip() == b'':
+        df = pd.DataFrame({
+            'date': pd.Series(dtype='M8[ns]'), 'uptime': pd.Series(dtype='int64'),
+            'recv': pd.Series(dtype='int64'), 'send': pd.Series(dtype='int64'),
+        })
+    else:
+        with perf.span('read_csv', nbytes=len(data), file=filename) as record:
+            df = pd.read_csv(io.BytesIO(data), encoding='SHIFT-JIS', header=None, names=names)
+            record['rows'] = len(df)
+        df = _clean_stg_frame(df)
+    return df, new_state
+
+
+def iter_stg_chunks(filename: str, chunksize: int):
+    """STGのCSVファイルをchunksize行ずつ読み込むジェネレータ
+
+    Args:
+        filename (str): CSVファイル名
+        chunksize (int): 一度に読み込む行数
+
+    Yields:
+        pd.DataFrame: date, uptime, recv, send の4カラムのDataFrame
+    """
+    with pd.read_csv(
+        filename,
+        encoding='SHIFT-JIS',
+        header=1,
+        names=['date', 'uptime', 'recv', 'send'],
+        chunksize=chunksize,
+    ) as reader:
+        for chunk in reader:
+            yield _clean_stg_frame(chunk)
+
+
+def read_stg_stream(filenames: list, memory_budget: int = MEMORY_BUDGET, progress=None,
+                    manifest: Optional[dict] = None) -> pd.DataFrame:
+    """複数のSTGのCSVファイルを少しずつ読み込み、日時順に結合する（省メモリ読込）
+        ファイルを最初の日時の順に並べ、チャンクごとに読込済みの最終日時以前の行
+        （ローテーションで重複した行）を除きながら列ごとの配列に追加する。
+        読込中に使うメモリはmemory_budget程度に抑えられる
+
+    Args:
+        filenames (list): CSVファイル名のリスト
+        memory_budget (int): 読込中に使うメモリの目安（バイト）
+        progress (callable): ファイルごとに progress(filename, rows) で呼び出す
+        manifest (Optional[dict]): チェック済みのファイル情報 {ファイル名: StgFileInfo}
+            （group_stg_filesの戻り値。ないファイルだけscan_stg_filesでチェックする）
+
+    Returns:
+        pd.DataFrame: 日時をインデックスとし、uptime, recv, send の3カラムのDataFrame
+            attrs['states'] はファイルごとの読込位置
+    """
+    chunksize = max(1000, memory_budget // STREAM_ROW_BYTES)
+    states = {}
+    for filename in filenames:
+        stat = os.stat(filename)
+        states[filename] = (stat.st_ino, stat.st_size)
+
+    parts = []
+    manifest = dict(manifest or {})
+    missing = [filename for filename in filenames if filename not in manifest]
+    if missing:
+        manifest.update((info.filename, info) for info in scan_stg_files(missing)[0])
+    first = {filename: info.first.value for filename, info in manifest.items()}  # NaT（行がない）は先頭になる
+    for filename in sorted(filenames, key=lambda f: first.get(f, pd.NaT.value)):
+        rows = 0
+        with perf.span('read_csv', nbytes=os.path.getsize(filename), file=filename) as record:
+            for chunk in iter_stg_chunks(filename, chunksize):
+                rows += _merge_sorted_run(parts, *_sorted_run(chunk), compact=True)
+            record['rows'] = rows
+        if progress is not None:
+            progress(filename, rows)
+
+    df = _frame_from_parts(parts)
+    df.attrs['states'] = states
+    return df
+
+
+def _sorted_run(df: pd.DataFrame) -> tuple:
+    """date, uptime, recv, send の4カラムのDataFrameを日時順の配列 (dates, values) にする
+        ファイル内の並びが崩れている場合だけ並べ替え、連続する同じ行（日時と値が同じ）は除く
+
+    Returns:
+        tuple: (日時のint64配列, uptime, recv, sendの3列の配列)
+    """
+    dates = df['date'].to_numpy(dtype='M8[ns]').view(np.int64)
+    values = df[STG_VALUE_COLUMNS].to_numpy()
+    if np.any(dates[1:] < dates[:-1]):
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+    dup = (dates[1:] == dates[:-1]) & (values[1:] == values[:-1]).all(axis=1)
+    if dup.any():
+        keep = np.concatenate([[True], ~dup])
+        dates, values = dates[keep], values[keep]
+    return (dates, values)
+
+
+def _merge_sorted_run(parts: list, dates: np.ndarray, values: np.ndarray, compact: bool = False) -> int:
+    """日時順に並んだ部分配列のリストpartsに、日時順の行（1つのランまたはチャンク）をマージする
+        読込済みの最終日時より後の行はそのまま末尾に追加する。以前の行（ローテーションの重複範囲）は
+        読込済みの同じ日時の行を優先して除き、読込済みにない日時の行だけを重複範囲に挿入する
+
+    Args:
+        parts (list): (日時のint64配列, 値の配列) のリスト（全体で日時順）。この関数で更新する
+        dates (np.ndarray): 追加する行の日時（int64、昇順）
+        values (np.ndarray): 追加する行の値
+        compact (bool): Trueの場合は追加する値の配列をcompact_int_arrayで小さくする
+
+    Returns:
+        int: 追加した行数
+    """
+    if len(dates) == 0:
+        return 0
+    last = parts[-1][0][-1] if parts else np.iinfo(np.int64).min
+    n = int(np.searchsorted(dates, last, side='right'))
+    added = len(dates) - n
+    if n > 0:
+        # 重複範囲（dates[0]以降）の読込済みの行を末尾から取り出す
+        tail = []
+        while parts and parts[-1][0][-1] >= dates[0]:
+            tail.append(parts.pop())
+        tail.reverse()
+        tail_dates = np.concatenate([d for d, _ in tail])
+        tail_values = np.concatenate([v for _, v in tail])
+        pos = int(np.searchsorted(tail_dates, dates[0], side='left'))
+        if pos > 0:
+            parts.append((tail_dates[:pos], tail_values[:pos]))
+        region_dates, region_values = tail_dates[pos:], tail_values[pos:]
+        # 読込済みにない日時の行だけを挿入する
+        idx = np.searchsorted(region_dates, dates[:n]).clip(max=len(region_dates) - 1)
+        extra = region_dates[idx] != dates[:n]
+        if extra.any():
+            region_dates = np.concatenate([region_dates, dates[:n][extra]])
+            region_values = np.concatenate([region_values, values[:n][extra]])
+            order = np.argsort(region_dates, kind='stable')
+            region_dates, region_values = region_dates[order], region_values[order]
+            added += int(extra.sum())
+        parts.append((region_dates, region_values))
+    if n < len(dates):
+        values = values[n:]
+        parts.append((dates[n:], compact_int_array(values) if compact else values))
+    return added
+
+
+def _frame_from_parts(parts: list) -> pd.DataFrame:
+    """(日時のint64配列, uptime, recv, sendの3列の配列) のリストを結合してDataFrameにする
+        結合先の配列を確保し、部分配列を移しながら解放する（partsは空になる）
+
+    Returns:
+        pd.DataFrame: 日時をインデックスとし、uptime, recv, send の3カラムのDataFrame
+    """
+    total = sum(len(dates) for dates, _ in parts)
+    dtype = np.result_type(*[values.dtype for _, values in parts]) if parts else np.int64
+    dates = np.empty(total, dtype=np.int64)
+    values = np.empty((total, len(STG_VALUE_COLUMNS)), dtype=dtype)
+    pos = 0
+    parts.reverse()
+    while parts:
+        chunk_dates, chunk_values = parts.pop()
+        dates[pos:pos+len(chunk_dates)] = chunk_dates
+        values[pos:pos+len(chunk_dates)] = chunk_values
+        pos += len(chunk_dates)
+    index = pd.DatetimeIndex(dates.view('M8[ns]'), name='date')
+    return pd.DataFrame(values, index=index, columns=STG_VALUE_COLUMNS, copy=False)
+
+
+def merge_stg_frames(dfs: list) -> pd.DataFrame:
+    """read_stg_fileで読み込んだDataFrameを、ファイルごとの日時順のランとしてマージする
+        ランを最初の日時の順に並べて順に追加し、隣り合うローテーションの重複範囲は日時で除く
+        （同じ日時の行は先に並んだファイルの行を残す）。全体のソートは行わない
+
+    Args:
+        dfs (list): date, uptime, recv, send の4カラムのDataFrameのリスト
+
+    Returns:
+        pd.DataFrame: 日時をインデックスとし、uptime, recv, send の3カラムのDataFrame
+    """
+    with perf.span('merge', rows=sum(len(df) for df in dfs), files=len(dfs)) as record:
+        runs = [_sorted_run(df) for df in dfs if len(df) > 0]
+        runs.sort(key=lambda run: run[0][0])
+        parts = []
+        for dates, values in runs:
+            _merge_sorted_run(parts, dates, values)
+        del runs
+        df = _frame_from_parts(parts)
+        record['merged_rows'] = len(df)
+    return df
+
+
+def _read_stg_file_traced(filename: str, cache: Optional[StgCache] = None) -> tuple:
+    """プロセスプールのワーカーでread_stg_fileを呼び出し、(DataFrame, ワーカーの処理時間の記録)を返す"""
+    perf.clear()
+    df = read_stg_file(filename, cache)
+    return (df, perf.records())
+
+
+def load_stg_files(filenames: list, cache: Optional[StgCache] = None, stream: bool = False,
+                   progress=None, max_workers: Optional[int] = MAX_WORKERS,
+                   memory_budget: int = MEMORY_BUDGET, step=None,
+                   cancel: Optional[threading.Event] = None,
+                   gap_factor: float = GAP_FACTOR, max_bps: float = MAX_BPS,
+                   manifest: Optional[dict] = None) -> pd.DataFrame:
+    """
+    STGのCSVファイルを読み込んで結合し、delta_timeを計算して除外する行をマスクし、列の型を小さくする
+    ファイルごとの読込位置（read_stg_tailの引数）をdf.attrs['states']に、
+    除外した行数（mask_invalid_rowsの戻り値）をdf.attrs['masked']に記録する
+
+    Args:
+        filenames (list): CSVファイル名のリスト
+        cache (Optional[StgCache]): 読込キャッシュ
+        stream (bool): Trueの場合は省メモリ読込（ファイルを順に少しずつ読み込みながら結合する）
+        progress: 1ファイル（省メモリ読込の場合は1チャンク）読み込むたびに、経過を表す文字列を引数に呼ばれる関数
+        max_workers (Optional[int]): 並列に読み込むプロセス数（1の場合はプロセスプールを使わずに順に読み込む）
+        memory_budget (int): 省メモリ読込で使うメモリの目安（バイト）
+        step: 1ファイル読み込むたびに、step(読込済みのファイル数, ファイル数)で呼ばれる関数
+        cancel (Optional[threading.Event]): セットされたら、次のファイルを読み込む前に中止する
+        gap_factor (float): mask_invalid_rowsのgap_factor
+        max_bps (float): mask_invalid_rowsのmax_bps
+        manifest (Optional[dict]): read_stg_streamのmanifest（省メモリ読込でファイルを並べる順に使う）
+
+    Raises:
+        concurrent.futures.CancelledError: cancelがセットされて中止した
+
+    Returns:
+        pd.DataFrame: 日時がindexで、uptime, recv, send, delta_time列のDataFrame
+    """
+    t = ExecTime()
+
+    def check_cancel():
+        if cancel is not None and cancel.is_set():
+            raise concurrent.futures.CancelledError()
+
+    if stream:
+        count = 0
+
+        def stream_progress(filename, rows):
+            nonlocal count
+            count += 1
+            if progress is not None:
+                progress(f' "{filename}" ... {rows:,} rows {t.laptime:.3f} sec\n')
+            if step is not None:
+                step(count, len(filenames))
+            check_cancel()
+        df = read_stg_stream(filenames, memory_budget=memory_budget, progress=stream_progress, manifest=manifest)
+        states = df.attrs['states']
+    else:
+        dfs = [None] * len(filenames)
+
+        def file_progress(count, idx):
+            if progress is not None:
+                cached = '（キャッシュ）' if dfs[idx].attrs.get('cached') else ''
+                progress(f' [{count}/{len(filenames)}] "{filenames[idx]}" ... {t.laptime:.3f} sec{cached}\n')
+            if step is not None:
+                step(count, len(filenames))
+
+        if max_workers == 1:
+            # 呼出し元がすでにプロセスプールのワーカーの場合などは、順に読み込む
+            for idx, filename in enumerate(filenames):
+                check_cancel()
+                dfs[idx] = read_stg_file(filename, cache)
+                file_progress(idx + 1, idx)
+        else:
+            # CSVファイルをプロセスプールで並列に読み込み、最後に1回だけ結合する
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(_read_stg_file_traced, filename, cache): idx
+                    for idx, filename in enumerate(filenames)
+                }
+                for count, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    if cancel is not None and cancel.is_set():
+                        # 読込中のファイルの完了だけを待ち、未着手のファイルは読み込まない
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise concurrent.futures.CancelledError()
+                    idx = futures[future]
+                    (dfs[idx], records) = future.result()
+                    perf.extend(records)
+                    file_progress(count, idx)
+        if cache is not None:
+            cache.evict()
+        states = {filename: df.attrs['state'] for filename, df in zip(filenames, dfs)}
+        df = merge_stg_frames(dfs)
+        del dfs
+
+    # delta_timeの計算
+    with perf.span('delta_time', rows=len(df)):
+        add_delta_time(df)
+    # 再起動・欠測・ありえない値の行をマスクする
+    with perf.span('mask', rows=len(df)) as record:
+        masked = mask_invalid_rows(df, gap_factor=gap_factor, max_bps=max_bps)
+        record.update(masked)
+    # 列の型を小さくしてメモリ使用量を減らす
+    compact_dtypes(df)
+    df.attrs['states'] = states
+    df.attrs['masked'] = masked
+    return df
+
+
+def append_stg_frames(df: pd.DataFrame, tails: list) -> pd.DataFrame:
+    """
+    追記分（read_stg_tailの戻り値）のうち、読込済みの最終日時より新しい行を
+    日時順・重複なしにしてdelta_timeを計算し、除外する行をマスクしたDataFrameを返す（dfには追加しない）
+
+    Args:
+        df (pd.DataFrame): 読込済みのDataFrame
+        tails (list): 追記分のDataFrameのリスト
+
+    Returns:
+        pd.DataFrame: 追加する行のDataFrame（dfと同じ列）
+    """
+    new = pd.concat(tails, ignore_index=True) if tails else pd.DataFrame(columns=['date'])
+    last = df.index[-1]
+    new = new[new['date'] > last]
+    new = new.sort_values('date', kind='mergesort').drop_duplicates(subset='date').set_index('date')
+    if len(new) > 0:
+        dates = new.index.to_numpy()
+        new['delta_time'] = np.diff(dates, prepend=last.to_datetime64()) / np.timedelta64(1, 's')
+        # 取得間隔は読込済みの末尾の中央値、再起動は読込済みの最終行のuptimeと比べて判定する
+        interval = np.nanmedian(df['delta_time'].to_numpy()[-APPEND_INTERVAL_ROWS:])
+        mask_invalid_rows(new, prev_uptime=int(df['uptime'].iloc[-1]), interval=interval)
+        compact_dtypes(new)
+    return new
+
+
+def compact_int_array(values: np.ndarray) -> np.ndarray:
+    """整数の配列を、値が収まる小さい型（uint32 / int32）に変換する
+        収まらない場合や整数でない場合は元の配列を返す
+
+    Args:
+        values (np.ndarray): 配列
+
+    Returns:
+        np.ndarray: 変換後の配列
+    """
+    if values.dtype.kind not in 'iu' or values.size == 0:
+        return values
+    vmin, vmax = values.min(), values.max()
+    for dtype in [np.uint32, np.int32]:
+        info = np.iinfo(dtype)
+        if info.min <= vmin and vmax <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def compact_dtypes(df: pd.DataFrame):
+    """DataFrameのメモリ使用量を減らすため列の型を小さくする
+        uptime, recv, sendは値の範囲を確認してuint32などに、delta_timeはfloat32にする
+
+    Args:
+        df (pd.DataFrame): uptime, recv, send, delta_time の列を持つDataFrame
+    """
+    for column in STG_VALUE_COLUMNS:
+        values = compact_int_array(df[column].to_numpy())
+        if values.dtype != df[column].dtype:
+            df[column] = values
+    if 'delta_time' in df and df['delta_time'].dtype != np.float32:
+        df['delta_time'] = df['delta_time'].astype(np.float32)
+
+
+def calc_bps(octets: pd.Series, delta_time: pd.Series) -> pd.Series:
+    """バイト数と取得間隔からスループット（bps）を計算する
+        uint32のまま8倍するとあふれるため、float64で計算する
+
+    Args:
+        octets (pd.Series): バイト数
+        delta_time (pd.Series): 取得間隔（秒）
+
+    Returns:
+        pd.Series: スループット（bps）
+    """
+    return octets.astype(np.float64) * 8 // delta_time.astype(np.float64)
+
+
+def add_delta_time(df: pd.DataFrame):
+    """取得間隔（delta_time）の列を追加する（先頭行はNaN）
+
+    Args:
+        df (pd.DataFrame): 日時順に並んだDataFrame
+    """
+    delta = np.empty(len(df), dtype=np.float64)
+    delta[:1] = np.nan
+    delta[1:] = np.diff(df.index.asi8) / 1e9
+    df['delta_time'] = delta
+
+
+def mask_invalid_rows(df: pd.DataFrame, prev_uptime: Optional[int] = None, interval: Optional[float] = None,
+                      gap_factor: float = GAP_FACTOR, max_bps: float = MAX_BPS) -> dict:
+    """スループットを計算できない行をNumPyの1回の処理で判定し、マスクする
+        マスクした行はrecv, sendを0、delta_timeをNaNにする（集計では合計に含まれず、
+        生データのスループットはNaNになる）。判定する行は次のとおり
+        - 再起動：uptimeが前の行より小さい（その行の値は差分ではなくカウンタの値になる）
+        - 欠測：先頭行、または取得間隔がintervalのgap_factor倍を超える
+        - 異常値：受信・送信のスループットがmax_bpsを超える
+
+    Args:
+        df (pd.DataFrame): 日時順に並んだ、uptime, recv, send, delta_time の列を持つDataFrame
+        prev_uptime (Optional[int]): dfの前の行のuptime（追記分の判定で使う）
+        interval (Optional[float]): 取得間隔（秒）。Noneの場合はdelta_timeの中央値
+        gap_factor (float): 欠測とみなす取得間隔の倍率
+        max_bps (float): ありえないスループット（bps）
+
+    Returns:
+        dict: 判定ごとの行数（'reboot', 'gap', 'rate'。複数に該当する行はそれぞれに数える）
+    """
+    if len(df) == 0:
+        return {'reboot': 0, 'gap': 0, 'rate': 0}
+    uptime = df['uptime'].to_numpy(dtype=np.int64)
+    recv = df['recv'].to_numpy()
+    send = df['send'].to_numpy()
+    delta = df['delta_time'].to_numpy(dtype=np.float64)
+    if interval is None:
+        interval = np.nanmedian(delta) if len(df) > 1 else np.nan
+
+    reboot = np.empty(len(df), dtype=bool)
+    reboot[0] = prev_uptime is not None and uptime[0] < prev_uptime
+    np.less(uptime[1:], uptime[:-1], out=reboot[1:])
+    with np.errstate(invalid='ignore'):
+        gap = ~(delta <= gap_factor * interval)  # NaN（先頭行）も欠測とする
+        limit = max_bps / 8 * delta
+        rate = (recv > limit) | (send > limit)
+    invalid = reboot | gap | rate
+    if invalid.any():
+        df['recv'] = np.where(invalid, 0, recv).astype(recv.dtype, copy=False)
+        df['send'] = np.where(invalid, 0, send).astype(send.dtype, copy=False)
+        df['delta_time'] = np.where(invalid, np.nan, delta).astype(df['delta_time'].dtype, copy=False)
+    return {'reboot': int(reboot.sum()), 'gap': int(gap.sum()), 'rate': int(rate.sum())}
+
+
+def masked_message(masked: dict) -> str:
+    """mask_invalid_rowsの戻り値を表示用の文字列にする"""
+    return f'除外した行: 再起動 {masked["reboot"]:,}、欠測 {masked["gap"]:,}、異常値 {masked["rate"]:,}'
+
+
+def slice_period(df: pd.DataFrame, date_from: str, date_to: str) -> pd.DataFrame:
+    """日付の範囲（date_fromの0時からdate_toの24時まで）の行を取り出す
+        日時順に並んだインデックスを二分探索し、コピーせずに位置で切り出す
+
+    Args:
+        df (pd.DataFrame): 日時順に並んだDataFrame
+        date_from (str): 開始日（YYYY-MM-DD）
+        date_to (str): 終了日（YYYY-MM-DD）
+
+    Returns:
+        pd.DataFrame: 指定期間のDataFrame（dfのビュー）
+    """
+    start = df.index.searchsorted(pd.Timestamp(date_from), side='left')
+    end = df.index.searchsorted(pd.Timestamp(date_to) + pd.Timedelta(days=1), side='left')
+    return df.iloc[start:end]
+
+
+class DayIndex():
+    """日ごとの集計情報（読込時に1回だけ作成し、追記分は最終日から作り直す）
+        日時順に並んだDataFrameの日ごとの行の範囲、行数、除外した行数、取得間隔の最小値・最大値、
+        生データの受信・送信スループットの最大値とその行位置を、日ごとの配列で持つ。
+        期間の選択肢、CSV情報、生データの最大値はDataFrameを走査せずにこの情報から求め、
+        期間の切り出しは行の範囲で行う
+    """
+    NS_PER_DAY = 86400 * 10**9
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Args:
+            df (pd.DataFrame): 日時順に並んだ、recv, send, delta_time の列を持つDataFrame
+        """
+        self.day = np.empty(0, dtype=np.int64)      # 1970-01-01からの日数
+        self.start = np.empty(0, dtype=np.int64)    # 行の範囲（startからendの前まで）
+        self.end = np.empty(0, dtype=np.int64)
+        self.count = np.empty(0, dtype=np.int64)
+        self.masked = np.empty(0, dtype=np.int64)
+        self.interval_min = np.empty(0, dtype=np.float64)
+        self.interval_max = np.empty(0, dtype=np.float64)
+        self.recv_max = np.empty(0, dtype=np.float64)
+        self.recv_argmax = np.empty(0, dtype=np.int64)  # 最大値の行位置（値がない日は-1）
+        self.send_max = np.empty(0, dtype=np.float64)
+        self.send_argmax = np.empty(0, dtype=np.int64)
+        self.update(df)
+
+    _FIELDS = ['day', 'start', 'end', 'count', 'masked', 'interval_min', 'interval_max',
+               'recv_max', 'recv_argmax', 'send_max', 'send_argmax']
+
+    def update(self, df: pd.DataFrame):
+        """dfの最終日（作成済みの最終日以降）の情報を作り直す（追記後に呼び出す）"""
+        offset = int(self.start[-1]) if len(self.day) > 0 else 0
+        keep = len(self.day) - 1 if len(self.day) > 0 else 0
+        with perf.span('day_index', rows=len(df) - offset):
+            part = self._build(df, offset)
+        for field in self._FIELDS:
+            setattr(self, field, np.concatenate([getattr(self, field)[:keep], part[field]]))
+
+    @staticmethod
+    def _build(df: pd.DataFrame, offset: int) -> dict:
+        t = df.index.asi8[offset:]
+        n = len(t)
+        if n == 0:
+            return {field: np.empty(0, dtype=np.int64) for field in DayIndex._FIELDS}
+        day = t // DayIndex.NS_PER_DAY
+        starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        ends = np.r_[starts[1:], n]
+        counts = ends - starts
+        group = np.repeat(np.arange(len(starts)), counts)
+        delta = df['delta_time'].to_numpy(dtype=np.float64)[offset:]
+        part = {
+            'day': day[starts],
+            'start': starts + offset,
+            'end': ends + offset,
+            'count': counts,
+            'masked': np.add.reduceat(np.isnan(delta), starts).astype(np.int64),
+            'interval_min': np.fmin.reduceat(delta, starts),
+            'interval_max': np.fmax.reduceat(delta, starts),
+        }
+        for column in ['recv', 'send']:
+            # calc_bpsと同じ計算（取得間隔が0の行はinf、除外した行はNaN）。floor_divideは遅いため、
+            # 割り算の値が日ごとの最大値に近い（切り捨ての差の2以内の）行だけで計算する
+            octets = df[column].to_numpy(dtype=np.float64)[offset:] * 8
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = octets / delta
+                near = np.flatnonzero(ratio >= np.repeat(np.fmax.reduceat(ratio, starts), counts) - 2)
+                bps = np.full(n, np.nan)
+                bps[near] = np.floor_divide(octets[near], delta[near])
+            day_max = np.fmax.reduceat(bps, starts)
+            argmax = np.full(len(starts), -1, dtype=np.int64)
+            hit = np.flatnonzero(bps == np.repeat(day_max, counts))
+            (days, first) = np.unique(group[hit], return_index=True)
+            argmax[days] = hit[first] + offset
+            part[f'{column}_max'] = day_max
+            part[f'{column}_argmax'] = argmax
+        return part
+
+    def dates(self) -> list:
+        """データのある日付（datetime.date）のリストを返す"""
+        return self.day.astype('M8[D]').tolist()
+
+    def days(self, date_from: str, date_to: str) -> slice:
+        """日付の範囲（date_fromからdate_toまで）の日の位置の範囲を返す"""
+        first = pd.Timestamp(date_from).value // self.NS_PER_DAY
+        last = pd.Timestamp(date_to).value // self.NS_PER_DAY
+        return slice(int(np.searchsorted(self.day, first, side='left')),
+                     int(np.searchsorted(self.day, last, side='right')))
+
+    def bounds(self, date_from: str, date_to: str) -> tuple:
+        """日付の範囲の行の範囲 (start, end) を返す（slice_periodと同じ範囲）"""
+        days = self.days(date_from, date_to)
+        if days.start >= days.stop:
+            return (0, 0)
+        return (int(self.start[days.start]), int(self.end[days.stop - 1]))
+
+    def max(self, column: str, days: slice = slice(None)) -> tuple:
+        """生データのスループットの最大値とその行位置を返す（値がなければ (NaN, -1)）
+
+        Args:
+            column (str): 'recv' または 'send'
+            days (slice): 日の位置の範囲（daysの戻り値）
+        """
+        values = getattr(self, f'{column}_max')[days]
+        if len(values) == 0 or np.isnan(values).all():
+            return (np.nan, -1)
+        pos = int(np.nanargmax(values))
+        return (float(values[pos]), int(getattr(self, f'{column}_argmax')[days][pos]))
+
+    def summary(self) -> dict:
+        """CSV情報（行数、除外した行数、取得間隔の最小値・最大値、送受信の最大値）を返す"""
+        return {
+            'rows': int(self.count.sum()),
+            'masked': int(self.masked.sum()),
+            'interval_min': float(np.fmin.reduce(self.interval_min)) if len(self.day) else np.nan,
+            'interval_max': float(np.fmax.reduce(self.interval_max)) if len(self.day) else np.nan,
+            'recv_max': self.max('recv')[0],
+            'send_max': self.max('send')[0],
+        }
+
+
+class ResamplePyramid():
+    """集計単位ごとの事前集計（ピラミッド）
+        MEAN_TIMESの各集計単位で合計したDataFrameを、細かい単位から順に作成する。
+        粗い単位は、その区切りを割り切れる最も粗い作成済みの単位から作成する。
+        取得間隔より細かい単位は作成せず、生データから集計する
+    """
+    def __init__(self):
+        self.levels = {}        # 集計単位 -> 合計済みのDataFrame
+        self.complete = False   # すべての単位を作成済みか
+        self._cancel = False
+
+    @staticmethod
+    def _nanos(rule: str) -> int:
+        return to_offset(rule).nanos
+
+    def cancel(self):
+        """作成中のピラミッドの作成を中止する"""
+        self._cancel = True
+
+    def _source(self, rule: str) -> Optional[tuple]:
+        """ruleの集計に使える、最も粗い作成済みの単位とDataFrameを返す"""
+        nanos = self._nanos(rule)
+        best = None
+        for level_rule, level_df in list(self.levels.items()):
+            level_nanos = self._nanos(level_rule)
+            if level_nanos <= nanos and nanos % level_nanos == 0:
+                if best is None or level_nanos > self._nanos(best[0]):
+                    best = (level_rule, level_df)
+        return best
+
+    def build(self, df: pd.DataFrame, wait=None):
+        """ピラミッドを作成する（バックグラウンドのスレッドから呼び出す）
+
+        Args:
+            df (pd.DataFrame): 読込済みのDataFrame（recv, send, delta_time）
+            wait: 各単位を作成する前に呼ばれる関数（優先する処理が終わるまで待つ場合など）
+        """
+        if len(df) == 0:
+            return
+        interval = np.nanmedian(df['delta_time'].to_numpy()) * 1e9
+        rules = sorted((r for r in MEAN_TIMES.values() if r != 'org'), key=self._nanos)
+        for rule in rules:
+            if wait is not None:
+                wait()
+            if self._cancel:
+                return
+            source = self._source(rule)
+            if source is None:
+                if self._nanos(rule) < interval:
+                    continue
+                level_df = df.resample(rule=rule)[SUM_COLUMNS].sum()
+            else:
+                level_df = source[1].resample(rule=rule).sum()
+            self.levels[rule] = level_df
+        self.complete = True
+
+    def update(self, df: pd.DataFrame):
+        """追記されたデータでピラミッドを更新する
+            各単位の最後の区切り以降だけを生データから集計し直す
+
+        Args:
+            df (pd.DataFrame): 追記後のDataFrame（recv, send, delta_time）
+        """
+        for rule, level_df in list(self.levels.items()):
+            if len(level_df) == 0:
+                continue
+            last = level_df.index[-1]
+            tail = df.iloc[df.index.searchsorted(last):].resample(rule=rule)[SUM_COLUMNS].sum()
+            self.levels[rule] = pd.concat([level_df.iloc[:-1], tail])
+
+    def get(self, rule: str) -> Optional[tuple]:
+        """ruleの集計に使える単位とDataFrameを返す（使えるものがなければNone）"""
+        return self._source(rule)
+
+
+def decimate_minmax(df: pd.DataFrame, columns: list, buckets: int) -> pd.DataFrame:
+    """描画用にデータを間引く
+        時間軸をbuckets個の等間隔の区間に分け、各区間の各列の最小値・最大値の行
+        （欠損値があれば最初の欠損値の行も）だけを残す。ピークは間引かれない
+
+    Args:
+        df (pd.DataFrame): 日時順に並んだDataFrame
+        columns (list): 最小値・最大値を残す列名のリスト
+        buckets (int): 区間の数（描画する横幅のピクセル数程度）
+
+    Returns:
+        pd.DataFrame: 間引いたDataFrame（行数が区間数の4倍以下の場合はそのまま）
+    """
+    n = len(df)
+    if buckets <= 0 or n <= buckets * 4:
+        return df
+    with perf.span('decimate', rows=n):
+        return _decimate_minmax(df, columns, buckets)
+
+
+def _decimate_minmax(df: pd.DataFrame, columns: list, buckets: int) -> pd.DataFrame:
+    n = len(df)
+    t = df.index.asi8
+    span = int(t[-1]) - int(t[0]) + 1
+    bucket = ((t - t[0]).astype(np.float64) * buckets // span).astype(np.int64)
+    # 各区間の開始位置（日時順なので区間は連続している）
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    positions = [starts, starts + counts - 1]
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        nan = np.isnan(values)
+        for reduce in (np.fmin, np.fmax):
+            target = np.repeat(reduce.reduceat(values, starts), counts)
+            hit = np.flatnonzero(values == target)
+            positions.append(hit[np.unique(group[hit], return_index=True)[1]])
+        hit = np.flatnonzero(nan)
+        positions.append(hit[np.unique(group[hit], return_index=True)[1]])
+    return df.iloc[np.unique(np.concatenate(positions))]
+
+
+class ViewCache():
+    """resample_viewの計算結果のLRUキャッシュ
+        (データの版数, 集計単位, 開始日, 終了日) をキーとし、maxsize件を超えたら
+        最後に使われたのが古いものから削除する。縦軸の単位はキーに含めず、
+        キャッシュしたbpsの値を単位に合わせて換算する。
+        生データ（'org'）の計算結果は読込済みのデータより大きく、切り出しとcalc_bpsだけで
+        求められるため保存しない。更新で古くなった版数の計算結果はdiscardで削除する
+    """
+    def __init__(self, maxsize: int = VIEW_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._views = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        with self._lock:
+            if key not in self._views:
+                return None
+            self._views.move_to_end(key)
+            return self._views[key]
+
+    def put(self, key: tuple, view: tuple):
+        with self._lock:
+            self._views[key] = view
+            self._views.move_to_end(key)
+            while len(self._views) > self.maxsize:
+                self._views.popitem(last=False)
+
+    def discard(self, version: int):
+        """版数がversionの計算結果を削除する"""
+        with self._lock:
+            for key in [key for key in self._views if key[0] == version]:
+                del self._views[key]
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+def resample_view(df: pd.DataFrame, rule: str, date_from: str, date_to: str,
+                  pyramid: Optional[ResamplePyramid] = None, days: Optional[DayIndex] = None) -> tuple:
+    """
+    指定期間を切り出してからリサンプルし、bps単位のスループットと最大値を返す
+    ピラミッドに事前集計があれば、最も近い単位の事前集計から集計する
+    日ごとの集計情報があれば、期間を行の範囲で切り出し、生データの最大値は集計情報から求める
+
+    Args:
+        df (pd.DataFrame): 読込済みのDataFrame（recv, send, delta_time）
+        rule (str): 集計単位（MEAN_TIMESの値）
+        date_from (str): 開始日（YYYY-MM-DD）
+        date_to (str): 終了日（YYYY-MM-DD）
+        pyramid (Optional[ResamplePyramid]): 事前集計
+        days (Optional[DayIndex]): dfの日ごとの集計情報
+
+    Returns:
+        tuple: (delta_time, recv_bps, send_bpsのDataFrame,
+                受信の最大値, 受信の最大値の日時, 送信の最大値, 送信の最大値の日時)
+    """
+    # 指定期間を抽出（集計の区切りは日の境界と一致するため、先に切り出しても結果は同じ）
+    if days is not None:
+        (start, end) = days.bounds(date_from, date_to)
+        raw = df
+        df = df.iloc[start:end]
+    else:
+        df = slice_period(df, date_from, date_to)
+
+    df = _throughput_rows(df, rule, pyramid)
+
+    if days is not None and rule == 'org':
+        # 生データの最大値は日ごとの最大値から求める
+        period = days.days(date_from, date_to)
+        (recv_max, recv_pos) = days.max('recv', period)
+        (send_max, send_pos) = days.max('send', period)
+        return (df, recv_max, _date_str(raw.index, recv_pos), send_max, _date_str(raw.index, send_pos))
+    return _max_view(df)
+
+
+def _throughput_rows(df: pd.DataFrame, rule: str, pyramid: Optional[ResamplePyramid] = None) -> pd.DataFrame:
+    """
+    切り出し済みの行を集計単位で集約し、bps単位のスループットのDataFrameを返す（resample_viewを参照）
+    ピラミッドに事前集計があれば、最初と最後の行を含む区切りの範囲を事前集計から集計する
+    """
+    # 指定時間で集約（生データの場合はコピーしない）
+    with perf.span('resample', rows=len(df), rule=rule) as record:
+        level = pyramid.get(rule) if pyramid is not None and rule != 'org' else None
+        if level is not None and len(df) > 0:
+            # 期間内の最初と最後のデータを含む区切りの範囲を事前集計から切り出す
+            level_rule, level_df = level
+            record['pyramid'] = level_rule
+            start = level_df.index.searchsorted(df.index[0].floor(level_rule))
+            end = level_df.index.searchsorted(df.index[-1], side='right')
+            df = level_df.iloc[start:end]
+            if level_rule != rule:
+                df = df.resample(rule=rule).sum()
+        elif rule != 'org':
+            df = df.resample(rule=rule)[SUM_COLUMNS].sum()
+
+    # スループットを計算
+    with perf.span('throughput', rows=len(df)):
+        return pd.DataFrame({
+            'delta_time': df['delta_time'],
+            'recv_bps': calc_bps(df['recv'], df['delta_time']),
+            'send_bps': calc_bps(df['send'], df['delta_time']),
+        }, index=df.index)
+
+
+def _date_str(index: pd.DatetimeIndex, pos: int) -> str:
+    """indexのpos番目の日時の文字列を返す（posが-1の場合は'-'）"""
+    if pos < 0:
+        return '-'
+    return re.sub(r'\.\d+$', '', str(index[pos]))
+
+
+def _max_date(values: pd.Series) -> str:
+    """最大値の発生日時の文字列を返す（値がない場合は'-'）"""
+    if not values.notna().any():
+        return '-'
+    return re.sub(r'\.\d+$', '', str(values.idxmax()))
+
+
+def _max_view(df: pd.DataFrame) -> tuple:
+    """
+    スループットのDataFrame（delta_time, recv_bps, send_bps）の送受信の最大値と
+    発生日時を調べ、resample_viewの戻り値の形にして返す
+    """
+    recv_max = df['recv_bps'].max()
+    send_max = df['send_bps'].max()
+    return (df, recv_max, _max_date(df['recv_bps']), send_max, _max_date(df['send_bps']))
+
+
+def scale_view(view: tuple, axis_unit: str) -> tuple:
+    """
+    resample_viewの結果を縦軸の単位に換算し、最大値の文字列を作成する
+
+    Args:
+        view (tuple): resample_viewの戻り値
+        axis_unit (str): 縦軸の単位（bps / kbps / Mbps / Gbps）
+
+    Returns:
+        tuple: (df, recv_unit, send_unit, axis_unit, div_unit, 受信MAXの文字列, 送信MAXの文字列)
+    """
+    (df, recv_max, recv_max_date, send_max, send_max_date) = view
+
+    if axis_unit == 'bps':
+        div_unit = 1
+    elif axis_unit == 'kbps':
+        div_unit = int(1e3)
+    elif axis_unit == 'Mbps':
+        div_unit = int(1e6)
+    elif axis_unit == 'Gbps':
+        div_unit = int(1e9)
+
+    recv_unit = 'recv_' + axis_unit
+    send_unit = 'send_' + axis_unit
+    df = pd.DataFrame({
+        'delta_time': df['delta_time'],
+        recv_unit: df['recv_bps'] / div_unit,
+        send_unit: df['send_bps'] / div_unit,
+    }, index=df.index)
+    recv_max = recv_max / div_unit
+    send_max = send_max / div_unit
+
+    # 送受信の最大値の文字列を作成、MbpsとGbpsは少数点3桁表示
+    if np.isnan(recv_max) or np.isnan(send_max):
+        recv_max_str = send_max_str = '-'  # 期間内にデータがない
+    elif axis_unit == 'Mbps' or axis_unit == 'Gbps':
+        recv_max_str = f'{recv_max:,.3f}'
+        send_max_str = f'{send_max:,.3f}'
+    else:
+        recv_max_str = f'{int(recv_max):,}'
+        send_max_str = f'{int(send_max):,}'
+
+    strlen_max = max(len(recv_max_str), len(send_max_str))
+
+    str1 = f'受信MAX: {recv_max_str:>{strlen_max}} {axis_unit} ({recv_max_date})'
+    str2 = f'送信MAX: {send_max_str:>{strlen_max}} {axis_unit} ({send_max_date})'
+
+    return (df, recv_unit, send_unit, axis_unit, div_unit, str1, str2)
+
+
+def resample_df(df: pd.DataFrame, rule: str, date_from: str, date_to: str, axis_unit: str,
+                pyramid: Optional[ResamplePyramid] = None, cache: Optional[ViewCache] = None,
+                version: int = 0) -> tuple:
+    """
+    指定期間・集計単位のスループットのDataFrameと各種変数を返す
+    キャッシュに同じ条件の計算結果があれば、単位の換算だけを行う
+
+    Args:
+        df (pd.DataFrame): 読込済みのDataFrame（recv, send, delta_time）
+        rule (str): 集計単位（MEAN_TIMESの値）
+        date_from (str): 開始日（YYYY-MM-DD）
+        date_to (str): 終了日（YYYY-MM-DD）
+        axis_unit (str): 縦軸の単位（bps / kbps / Mbps / Gbps）
+        pyramid (Optional[ResamplePyramid]): 事前集計
+        cache (Optional[ViewCache]): 計算結果のキャッシュ
+        version (int): データの版数（読込・更新のたびに変わる値）
+
+    Returns:
+        tuple: (df, recv_unit, send_unit, axis_unit, div_unit, 受信MAXの文字列, 送信MAXの文字列)
+    """
+    key = (version, rule, date_from, date_to)
+    view = cache.get(key) if cache is not None else None
+    if view is None:
+        view = resample_view(df, rule, date_from, date_to, pyramid=pyramid)
+        if cache is not None and rule != 'org':
+            cache.put(key, view)
+    return scale_view(view, axis_unit)
+
+
+def throughput_stats(df: pd.DataFrame, date_from: str, date_to: str, threshold: float = STATS_THRESHOLD,
+                     window: str = STATS_WINDOW, days: Optional[DayIndex] = None) -> dict:
+    """
+    指定期間の送受信ごとのスループット統計を、生データからNumPyの1回の処理で求める
+    パーセンタイルとピークはwindowごとの平均スループット（課金の95パーセンタイルと同じ5分平均など）から、
+    しきい値の超過時間は生データの行（除外した行を除く）の取得間隔の合計から求める
+
+    Args:
+        df (pd.DataFrame): 読込済みのDataFrame（recv, send, delta_time）
+        date_from (str): 開始日（YYYY-MM-DD）
+        date_to (str): 終了日（YYYY-MM-DD）
+        threshold (float): しきい値（bps）
+        window (str): パーセンタイルとピークを求める平均の区切り（日の境界にそろう単位）
+        days (Optional[DayIndex]): dfの日ごとの集計情報（あれば期間を行の範囲で切り出す）
+
+    Returns:
+        dict: {'window', 'threshold', 'seconds'（データのある秒数）,
+               'recv' / 'send': {'p50'などのパーセンタイル, 'peak', 'peak_date', 'over_seconds'}}
+    """
+    if days is not None:
+        (start, end) = days.bounds(date_from, date_to)
+        df = df.iloc[start:end]
+    else:
+        df = slice_period(df, date_from, date_to)
+
+    stats = {'window': window, 'threshold': threshold, 'seconds': 0.0}
+    empty = {**{f'p{p}': np.nan for p in STATS_PERCENTILES}, 'peak': np.nan, 'peak_date': '-', 'over_seconds': 0.0}
+    stats.update(recv=dict(empty), send=dict(empty))
+    with perf.span('stats', rows=len(df)):
+        delta = df['delta_time'].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(delta)
+        if not valid.any():
+            return stats
+        # windowの区切りごとの秒数（日の境界からの区切り番号で集計する）
+        nanos = to_offset(window).nanos
+        t = df.index.asi8
+        first_bin = t[0] // nanos
+        bins = t // nanos - first_bin
+        seconds = np.bincount(bins, weights=np.where(valid, delta, 0.0))
+        has_data = seconds > 0
+        stats['seconds'] = float(seconds.sum())
+        for column in ['recv', 'send']:
+            octets = df[column].to_numpy(dtype=np.float64) * 8
+            # 区切りごとの平均スループット（resample_viewと同じく合計バイト数÷合計秒数を切り捨てる）
+            bps = np.floor(np.bincount(bins, weights=octets)[has_data] / seconds[has_data])
+            result = stats[column]
+            for p, value in zip(STATS_PERCENTILES, np.percentile(bps, STATS_PERCENTILES)):
+                result[f'p{p}'] = float(value)
+            peak = int(np.argmax(bps))
+            result['peak'] = float(bps[peak])
+            peak_bin = np.flatnonzero(has_data)[peak] + first_bin
+            result['peak_date'] = str(pd.Timestamp(peak_bin * nanos))
+            # しきい値を超えた行の取得間隔の合計
+            with np.errstate(invalid='ignore'):
+                over = octets > threshold * delta
+            result['over_seconds'] = float(delta[over & valid].sum())
+    return stats
+
+
+def format_bps(value: float) -> str:
+    """bpsの値を接頭辞（k / M / G）を付けた文字列にする"""
+    if np.isnan(value):
+        return '-'
+    for unit, div in [('Gbps', 1e9), ('Mbps', 1e6), ('kbps', 1e3)]:
+        if value >= div:
+            return f'{value / div:,.3f} {unit}'
+    return f'{value:,.0f} bps'
+
+
+def stats_text(stats: dict) -> list:
+    """throughput_statsの戻り値を表示用の文字列のリストにする"""
+    window = [k for k, v in MEAN_TIMES.items() if v == stats['window']]
+    text = [f'統計（{window[0] if window else stats["window"]}、しきい値 {format_bps(stats["threshold"])}）']
+    for label, column in [('受信', 'recv'), ('送信', 'send')]:
+        result = stats[column]
+        text.append(f' {label}: ' + ' / '.join(f'p{p} {format_bps(result[f"p{p}"])}' for p in STATS_PERCENTILES))
+        text.append(f'   ピーク {format_bps(result["peak"])} ({result["peak_date"]})、'
+                    f'超過 {result["over_seconds"]:,.0f} 秒')
+    return text
+
+
+class StgSeries():
+    """1つの対象（ターゲットアドレス・インターフェース）の読込済みデータ
+        読込済みのDataFrame、日ごとの集計情報、事前集計、CSVファイルごとの読込位置をまとめて持つ。
+        事前集計はbuild_pyramidで作成する（時間がかかるため、バックグラウンドのスレッドから呼び出す）。
+        版数は読込・更新のたびに全対象で重複しない値にする（計算結果のキャッシュのキー）
+    """
+    _versions = itertools.count(1)
+
+    def __init__(self, target: list, df: pd.DataFrame, filenames: list, name: Optional[str] = None):
+        self.target = list(target)
+        self.name = target_address(target) if name is None else name
+        self.df = df
+        self.filenames = list(filenames)
+        self.states = dict(df.attrs.get('states', {}))  # CSVファイルごとの読込位置
+        self.days = DayIndex(df)
+        self.version = next(StgSeries._versions)
+        self.pyramid = ResamplePyramid()
+
+    def build_pyramid(self, wait=None):
+        """作成中の事前集計を中止し、事前集計を作り直す（呼び出したスレッドで作成する）
+
+        Args:
+            wait: ResamplePyramid.buildのwait
+        """
+        self.pyramid.cancel()
+        self.pyramid = ResamplePyramid()
+        self.pyramid.build(self.df, wait=wait)
+
+    def refresh(self) -> tuple:
+        """
+        CSVファイルの追記分だけを読み込み、self.dfの末尾に追加する
+        追加した場合は版数が変わる（古い版数の計算結果はViewCache.discardで削除する）
+
+        Returns:
+            tuple: (追加した行のDataFrame, 読み込めなかったファイルの(ファイル名, 例外)のリスト)
+        """
+        tails = []
+        errors = []
+        for filename in self.filenames:
+            try:
+                df, self.states[filename] = read_stg_tail(filename, self.states.get(filename))
+            except Exception as err:
+                errors.append((filename, err))
+                continue
+            tails.append(df)
+        # 読込済みの最終日時より新しい行だけを、日時順・重複なしにして追加する
+        df = append_stg_frames(self.df, tails)
+        if len(df) > 0:
+            # 表示中のスレッドが古いdfと新しい集計情報を組み合わせないよう、コピーを更新してから差し替える
+            days = copy.copy(self.days)
+            self.df = pd.concat([self.df, df])
+            days.update(self.df)
+            self.days = days
+            if self.pyramid.complete:
+                self.pyramid.update(self.df)
+            else:
+                # 作成中の事前集計は使えないため破棄する（呼出し元でbuild_pyramidを呼んで作り直す）
+                self.pyramid.cancel()
+                self.pyramid = ResamplePyramid()
+            self.version = next(StgSeries._versions)
+        return (df, errors)
+
+    def dates(self) -> set:
+        """データのある日付の集合を返す"""
+        return set(self.days.dates())
+
+    def view(self, rule: str, date_from: str, date_to: str, cache: Optional[ViewCache] = None) -> tuple:
+        """指定期間・集計単位のresample_viewの戻り値を返す（キャッシュがあれば再利用する）"""
+        key = (self.version, rule, date_from, date_to)
+        view = cache.get(key) if cache is not None else None
+        if view is None:
+            view = resample_view(self.df, rule, date_from, date_to, pyramid=self.pyramid, days=self.days)
+            if cache is not None and rule != 'org':
+                cache.put(key, view)
+        return view
+
+    def _rows(self, t0: pd.Timestamp, t1: pd.Timestamp) -> slice:
+        """t0～t1の範囲の行（前後1行を含む）の位置を二分探索で求める"""
+        index = self.df.index
+        return slice(max(index.searchsorted(t0) - 1, 0), index.searchsorted(t1, side='right') + 1)
+
+    def detail_rule(self, t0: pd.Timestamp, t1: pd.Timestamp, rows: int, rule: str) -> str:
+        """
+        t0～t1の範囲をrows行以下で描画できる、ruleより細かい集計単位のうち最も細かいものを返す
+        （生データがrows行以下の場合は'org'、ruleより細かい単位ではrows行を超える場合はrule）
+
+        Args:
+            t0 (pd.Timestamp): 範囲の開始日時
+            t1 (pd.Timestamp): 範囲の終了日時
+            rows (int): 描画する行数の上限（横幅のピクセル数など）
+            rule (str): 選択中の集計単位（MEAN_TIMESの値）
+
+        Returns:
+            str: 集計単位（MEAN_TIMESの値）
+        """
+        if rule == 'org':
+            return rule
+        rows_slice = self._rows(t0, t1)
+        if rows_slice.stop - rows_slice.start <= rows:
+            return 'org'
+        nanos = to_offset(rule).nanos
+        span = (t1 - t0).value
+        for level_rule in sorted((r for r in MEAN_TIMES.values() if r != 'org'), key=lambda r: to_offset(r).nanos):
+            level_nanos = to_offset(level_rule).nanos
+            if level_nanos >= nanos:
+                break
+            if span // level_nanos + 2 <= rows:
+                return level_rule
+        return rule
+
+    def detail(self, rule: str, t0: pd.Timestamp, t1: pd.Timestamp) -> tuple:
+        """
+        t0～t1の範囲（前後1行を含む）を集計単位で集約し、resample_viewの戻り値の形で返す
+        （プレビューを拡大したときに、表示範囲だけを細かい単位で描画し直すため）
+        """
+        return _max_view(_throughput_rows(self.df.iloc[self._rows(t0, t1)], rule, self.pyramid))
+
+    def resample(self, rule: str, date_from: str, date_to: str, axis_unit: str,
+                 cache: Optional[ViewCache] = None) -> tuple:
+        """指定期間・集計単位のスループットのDataFrameと各種変数を返す（resample_dfと同じ）"""
+        return scale_view(self.view(rule, date_from, date_to, cache), axis_unit)
+
+    def stats(self, date_from: str, date_to: str, threshold: float = STATS_THRESHOLD,
+              cache: Optional[ViewCache] = None) -> dict:
+        """指定期間のthroughput_statsの戻り値を返す（キャッシュがあれば再利用する）"""
+        key = (self.version, 'stats', date_from, date_to, threshold)
+        stats = cache.get(key) if cache is not None else None
+        if stats is None:
+            stats = throughput_stats(self.df, date_from, date_to, threshold, days=self.days)
+            if cache is not None:
+                cache.put(key, stats)
+        return stats
+
+
+def target_names(targets: list) -> dict:
+    """
+    対象情報ごとの表示名（ファイル名にも使う）を返す
+    ターゲットアドレスが同じ対象が複数ある場合（インターフェースが異なる場合）は、ifIndexを付ける
+    それでも重複する場合は、異なっている項目（Interval、OIDの順）の値を付け、
+    すべての項目が同じ場合は連番を付ける（表示名は対象ごとに必ず異なる）
+
+    Args:
+        targets (list): 対象情報（_parse_stg_headerの戻り値のtuple）のリスト
+
+    Returns:
+        dict: {対象情報: 表示名}
+    """
+    names = {target: target_address(target) for target in targets}
+    # ifIndexは重複すれば付け、Interval、OIDは重複する対象の間で値が異なる場合だけ付ける
+    for index, always in ((3, True), (2, False), (1, False)):
+        duplicates = collections.defaultdict(list)
+        for target in targets:
+            duplicates[names[target]].append(target)
+        for group in duplicates.values():
+            values = [target[index].split(':', 1)[-1] for target in group]
+            if len(group) > 1 and (always or len(set(values)) > 1):
+                for target, value in zip(group, values):
+                    names[target] += '_' + value
+    used = set(names.values())
+    seen = set()
+    for target in targets:
+        name = names[target]
+        if name in seen:  # 2つ目以降に連番を付ける
+            number = 2
+            while f'{name}_{number}' in used:
+                number += 1
+            names[target] = f'{name}_{number}'
+            used.add(names[target])
+        seen.add(name)
+    return names
+
+
+def _fill_raw(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    生データは対象ごとに取得日時がそろわないため、共通の時間軸の欠損値を各対象の直前の値で埋める
+    （各対象の最初のデータより前と最後のデータより後は欠損値のままにする）
+    """
+    return df.ffill().where(df.bfill().notna())
+
+
+def resample_multi(series: list, rule: str, date_from: str, date_to: str, axis_unit: str,
+                   mode: str = 'overlay', cache: Optional[ViewCache] = None) -> tuple:
+    """
+    複数の対象のスループットを共通の時間軸にそろえ、重ね表示用または合計のDataFrameと各種変数を返す
+    集計の区切りは日の境界にそろっているため、各対象の日時の和集合が共通の時間軸になる
+
+    Args:
+        series (list): StgSeriesのリスト
+        rule (str): 集計単位（MEAN_TIMESの値）
+        date_from (str): 開始日（YYYY-MM-DD）
+        date_to (str): 終了日（YYYY-MM-DD）
+        axis_unit (str): 縦軸の単位（bps / kbps / Mbps / Gbps）
+        mode (str): 'overlay'（対象ごとの列を並べる）または 'sum'（送受信ごとに合計する）
+        cache (Optional[ViewCache]): 計算結果のキャッシュ
+
+    Returns:
+        tuple: (df, 描画する列名のリスト, 出力する列名のリスト, axis_unit, div_unit, 最大値の文字列)
+    """
+    views = {s.name: s.view(rule, date_from, date_to, cache) for s in series}
+    return combine_views(views, rule, axis_unit, mode)
+
+
+def combine_views(views: dict, rule: str, axis_unit: str, mode: str = 'overlay') -> tuple:
+    """
+    対象ごとのresample_viewの戻り値を共通の時間軸にそろえ、重ね表示用または合計にする（resample_multiを参照）
+
+    Args:
+        views (dict): {表示名: resample_viewの戻り値}
+        rule (str): viewsの集計単位（MEAN_TIMESの値）
+        axis_unit (str): 縦軸の単位（bps / kbps / Mbps / Gbps）
+        mode (str): 'overlay' または 'sum'
+
+    Returns:
+        tuple: resample_multiの戻り値
+    """
+    if mode == 'sum':
+        recv = pd.DataFrame({name: view[0]['recv_bps'] for name, view in views.items()})
+        send = pd.DataFrame({name: view[0]['send_bps'] for name, view in views.items()})
+        if rule == 'org':
+            recv = _fill_raw(recv)
+            send = _fill_raw(send)
+            delta_time = np.diff(recv.index.asi8, prepend=np.nan) / 1e9
+        else:
+            delta_time = np.full(len(recv), to_offset(rule).nanos / 1e9)
+        view = _max_view(pd.DataFrame({
+            'delta_time': delta_time,
+            'recv_bps': recv.sum(axis=1, min_count=1),
+            'send_bps': send.sum(axis=1, min_count=1),
+        }, index=recv.index))
+        (df, recv_unit, send_unit, axis_unit, div_unit, str1, str2) = scale_view(view, axis_unit)
+        return (df, [recv_unit, send_unit], ['delta_time', recv_unit, send_unit],
+                axis_unit, div_unit, str1 + '\n' + str2)
+
+    columns = {}
+    texts = []
+    for name, view in views.items():
+        (df, recv_unit, send_unit, axis_unit, div_unit, str1, str2) = scale_view(view, axis_unit)
+        columns[f'{name} {recv_unit}'] = df[recv_unit]
+        columns[f'{name} {send_unit}'] = df[send_unit]
+        texts += [name, ' ' + str1, ' ' + str2]
+    df = pd.DataFrame(columns)
+    if rule == 'org':
+        df = _fill_raw(df)
+    return (df, list(df.columns), list(df.columns), axis_unit, div_unit, '\n'.join(texts))
+
+
+def detail_views(series: list, t0: pd.Timestamp, t1: pd.Timestamp, rows: int, rule: str) -> tuple:
+    """
+    プレビューの表示範囲t0～t1を、rows行以下で描画できる最も細かい共通の集計単位で集約する
+    選択中の集計単位より細かくできる場合だけ集約する（拡大したときに生データまで表示するため）
+
+    Args:
+        series (list): 表示中のStgSeriesのリスト
+        t0 (pd.Timestamp): 表示範囲の開始日時
+        t1 (pd.Timestamp): 表示範囲の終了日時
+        rows (int): 描画する行数の上限（横幅のピクセル数など）
+        rule (str): 選択中の集計単位（MEAN_TIMESの値）
+
+    Returns:
+        tuple: (集計単位, {表示名: resample_viewの戻り値})
+            ruleより細かくできない場合は (rule, None)
+    """
+    # 対象ごとに選んだ単位のうち最も粗いもの（生データは0）にそろえる
+    rules = [s.detail_rule(t0, t1, rows, rule) for s in series]
+    detail = max(rules, key=lambda r: 0 if r == 'org' else to_offset(r).nanos)
+    if detail == rule:
+        return (rule, None)
+    return (detail, {s.name: s.detail(detail, t0, t1) for s in series})
+
+
+class PreviewRenderer():
+    """プレビュー用のグラフ描画
+        線・テキスト・凡例・軸の書式は最初の描画で一度だけ作成し、以降は
+        線のデータ、軸の範囲、ラベル、最大値のテキストだけを更新する。
+        軸の範囲やラベルが前回と同じ場合は、線とテキストを除いた背景を再利用して
+        線とテキストだけを描き直す（ブリッティング）
+    """
+    def __init__(self, fig: Figure, ax, canvas):
+        self.fig = fig
+        self.ax = ax
+        self.canvas = canvas
+        self.lines = None
+        self.text = None
+        self.legend = None
+        self.updating = False  # render中はTrue（軸の範囲の変更を無視するため）
+        self.timings = collections.deque(maxlen=100)  # 描画時間（秒）の履歴
+        self._background = None
+        self._key = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # 他の処理（ツールバー等）で描画されたら背景は使えない
+        if not self.updating:
+            self._background = None
+
+    def _setup_lines(self, x, columns: list):
+        """線と凡例を作成する（作成済みの線は削除する）"""
+        for line in self.lines or []:
+            line.remove()
+        self.ax.set_prop_cycle(None)  # 線の色を最初の色から割り当て直す
+        self.lines = [self.ax.plot(x, np.zeros(len(x)), label=column)[0] for column in columns]
+        self.legend = self.ax.legend()
+        self._key = None
+
+    def _setup(self, x, columns: list):
+        """線・テキスト・軸の書式を作成する"""
+        ax = self.ax
+        self._setup_lines(x, columns)
+        self.text = ax.text(0.05, 0.9, '', family='ms gothic', transform=ax.transAxes)
+        # X軸ラベル
+        ax.set_xlabel('日時')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d %H:%M'))
+        ax.xaxis.set_minor_locator(AutoMinorLocator(6))
+        ax.tick_params(axis='x', which='major', labelrotation=30)
+        # Y軸ラベル
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, loc: f'{x:,.1f}'))
+        ax.yaxis.set_minor_locator(AutoMinorLocator())
+        # グリッド線
+        ax.grid(b=True, axis='both', which='major', color='gray', linestyle='--', alpha=0.9)
+        ax.grid(b=True, axis='both', which='minor', color='gray', linestyle='--', alpha=0.2)
+
+    def set_lines(self, df: pd.DataFrame, columns: list):
+        """線のデータを更新する（描画はしない）"""
+        x = df.index.to_numpy()
+        for line, column in zip(self.lines, columns):
+            line.set_data(x, df[column].to_numpy())
+
+    def render(self, df: pd.DataFrame, columns: list, title: str, ylabel: str,
+               ylim_top: Optional[float], text: str):
+        """グラフを描画する
+
+        Args:
+            df (pd.DataFrame): 描画するDataFrame（間引き済み）
+            columns (list): 描画する列名（受信, 送信）
+            title (str): タイトル
+            ylabel (str): Y軸のラベル
+            ylim_top (Optional[float]): Y軸の上限（Noneの場合はデータの最大値に合わせる）
+            text (str): 送受信の最大値のテキスト
+        """
+        t = time.perf_counter()
+        with perf.span('draw', rows=len(df)) as record:
+            self.updating = True
+            try:
+                x = df.index.to_numpy()
+                if self.lines is None:
+                    self._setup(x, columns)
+                elif len(self.lines) != len(columns):
+                    self._setup_lines(x, columns)
+                self.set_lines(df, columns)
+                self.text.set_text(text)
+
+                # 軸の範囲（Y軸の自動はデータの最大値に5%の余白）
+                xlim = tuple(mdates.date2num(x[[0, -1]])) if len(x) > 1 else self.ax.get_xlim()
+                if ylim_top is None:
+                    top = np.nanmax(df[columns].to_numpy(dtype=np.float64), initial=0)
+                    ylim_top = top * 1.05 if top > 0 else 1
+                key = (xlim, (0, ylim_top), title, ylabel, tuple(columns),
+                       tuple(self.fig.get_size_inches()), self.fig.dpi)
+
+                artists = self.lines + [self.text]
+                record['blit'] = key == self._key and self._background is not None
+                if record['blit']:
+                    # 背景を再利用して線とテキストだけを描き直す
+                    self.canvas.restore_region(self._background)
+                else:
+                    self.ax.set_xlim(xlim)
+                    self.ax.set_ylim(0, ylim_top)
+                    self.ax.set_title(title)
+                    self.ax.set_ylabel(ylabel)
+                    for legend_text, column in zip(self.legend.get_texts(), columns):
+                        legend_text.set_text(column)
+                    # 線とテキストを除いて描画し、背景として保存する
+                    for artist in artists:
+                        artist.set_visible(False)
+                    self.canvas.draw()
+                    self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+                    self._key = key
+                    for artist in artists:
+                        artist.set_visible(True)
+                for artist in artists:
+                    self.ax.draw_artist(artist)
+                self.canvas.blit(self.fig.bbox)
+            finally:
+                self.updating = False
+        self.timings.append(time.perf_counter() - t)
+
+
+def adjust_axes(ax, axis_unit: str, ylim_top: Optional[float], text: str):
+    """
+    グラフ表示・画像出力用にaxesの見栄えを調整する
+
+    Args:
+        ax: 調整するaxes
+        axis_unit (str): 縦軸の単位
+        ylim_top (Optional[float]): Y軸の上限（Noneの場合は自動）
+        text (str): 送受信の最大値のテキスト
+    """
+    # X軸ラベル
+    ax.set_xlabel('日時')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d %H:%M'))
+    ax.xaxis.set_minor_locator(AutoMinorLocator(6))
+    # Y軸ラベル
+    ax.set_ylabel(axis_unit)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, loc: f'{x:,.1f}'))
+    ax.yaxis.set_minor_locator(AutoMinorLocator())
+    # グリッド線
+    ax.grid(b=True, axis='both', which='major', color='gray', linestyle='--', alpha=0.9)
+    ax.grid(b=True, axis='both', which='minor', color='gray', linestyle='--', alpha=0.2)
+    # Y軸のスケール
+    if ylim_top is None:
+        ax.set_ylim(0,)
+    else:
+        ax.set_ylim([0, ylim_top])
+
+    # 送受信の最大値をグラフ上にテキスト表示
+    ax.text(0.05, 0.9, text, family='ms gothic', transform=ax.transAxes)
+
+
+def plot_graph(df: pd.DataFrame, columns: list, title: str, axis_unit: str,
+               ylim_top: Optional[float], text: str, ax=None):
+    """
+    スループットのグラフを描画してaxesを返す
+
+    Args:
+        df (pd.DataFrame): 描画するDataFrame（間引き済み）
+        columns (list): 描画する列名（受信, 送信）
+        title (str): タイトル
+        axis_unit (str): 縦軸の単位
+        ylim_top (Optional[float]): Y軸の上限（Noneの場合は自動）
+        text (str): 送受信の最大値のテキスト
+        ax: 描画先のaxes（Noneの場合は新しいfigureに描画する）
+    """
+    with perf.span('plot', rows=len(df)):
+        ax = df.plot(
+            ax=ax,
+            grid=True,
+            y=columns,
+            title=title,
+            rot=30,
+            x_compat=True
+            )
+
+        # axesの見栄えを調整する
+        adjust_axes(ax, axis_unit, ylim_top, text)
+    return ax
+
+
+def export_filename(basename: str, fmt: str = 'csv', compression: Optional[str] = None) -> str:
+    """出力形式と圧縮方式に合わせた拡張子を付けたファイル名を返す"""
+    return basename + EXPORT_FORMATS[fmt] + (CSV_COMPRESSIONS[compression] if fmt == 'csv' else '')
+
+
+def stats_filename(basename: str) -> str:
+    """スループット統計のCSVファイル名を返す"""
+    return f'{basename}_統計.csv'
+
+
+def write_stats_csv(stats: dict, filename: str):
+    """
+    throughput_statsの戻り値をCSVファイルに出力する
+    項目ごとに受信・送信の値（bps、秒、日時）を1行にする（集計の区切り・しきい値・秒数は両方に同じ値）
+
+    Args:
+        stats (dict): throughput_statsの戻り値
+        filename (str): 出力ファイル名
+    """
+    items = [f'p{p}' for p in STATS_PERCENTILES] + ['peak', 'peak_date', 'over_seconds']
+    common = [('window', stats['window']), ('threshold_bps', stats['threshold']), ('seconds', stats['seconds'])]
+    df = pd.DataFrame({
+        'item': [item for item, _ in common] + items,
+        'recv': [value for _, value in common] + [stats['recv'][item] for item in items],
+        'send': [value for _, value in common] + [stats['send'][item] for item in items],
+    })
+    df.to_csv(filename, index=False, encoding='utf-8')
+
+
+def _datetime_unit(index: pd.DatetimeIndex) -> str:
+    """日時の文字列に必要な秒以下の単位（to_csvと同じく、全行で秒以下が0なら秒まで）"""
+    values = index.asi8
+    if np.all(values % 10**9 == 0):
+        return 's'
+    if np.all(values % 10**6 == 0):
+        return 'ms'
+    if np.all(values % 10**3 == 0):
+        return 'us'
+    return 'ns'
+
+
+def _format_column(values: np.ndarray, decimals: Optional[int]) -> np.ndarray:
+    """列の値を文字列（object配列）に変換する（欠損値は空文字列）"""
+    if values.dtype.kind != 'f':
+        return values.astype(str).astype(object)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    text = values.astype(str).astype(object)
+    text[np.isnan(values)] = ''
+    return text
+
+
+def iter_csv_chunks(df: pd.DataFrame, columns: list, chunksize: int = EXPORT_CHUNK_ROWS,
+                    decimals: Optional[int] = None):
+    """
+    DataFrameをCSVの文字列にしてchunksize行ずつ返すジェネレータ（最初はヘッダ行）
+    to_csvと同じ内容を、列ごとにNumPyで文字列に変換してから行にまとめて作成する
+    （数値は最短で元の値に戻る表記、欠損値は空文字列、日時は全行に必要な桁数まで）
+
+    Args:
+        df (pd.DataFrame): 日時をインデックスとするDataFrame
+        columns (list): 出力する列名
+        chunksize (int): 一度に変換する行数
+        decimals (Optional[int]): 小数点以下の桁数（Noneの場合は丸めない）
+
+    Yields:
+        str: CSVの文字列（改行を含む）
+    """
+    yield ','.join([str(df.index.name or '')] + [str(column) for column in columns]) + '\n'
+    unit = _datetime_unit(df.index) if len(df) > 0 else 's'
+    # チャンクごとにpandasのオブジェクトを作ると循環参照で解放が遅れるため、NumPyの配列を切り出す
+    index = df.index.to_numpy(dtype='M8[ns]')
+    values = [df[column].to_numpy() for column in columns]
+    for start in range(0, len(df), chunksize):
+        dates = np.datetime_as_string(index[start:start + chunksize], unit=unit)
+        # 'YYYY-MM-DDTHH:MM:SS'のTを空白にする
+        dates.view(np.uint32).reshape(len(dates), -1)[:, 10] = ord(' ')
+        parts = [dates.astype(object)]
+        parts += [_format_column(column[start:start + chunksize], decimals) for column in values]
+        yield '\n'.join(map(','.join, zip(*parts))) + '\n'
+
+
+def _open_csv(filename: str, compression: Optional[str]):
+    """圧縮方式に合わせてCSVファイルをテキストの書き込みモードで開く"""
+    if compression is None:
+        return open(filename, 'w', encoding='utf-8', newline='')
+    if compression == 'gzip':
+        return gzip.open(filename, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstdで圧縮するにはzstandardパッケージが必要です')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(filename, 'wb')),
+                                encoding='utf-8', newline='')
+    raise ValueError(f'圧縮方式が不正です: {compression}')
+
+
+def _write_arrow(df: pd.DataFrame, columns: list, filename: str, fmt: str, chunksize: int,
+                 compression: Optional[str], decimals: Optional[int], step):
+    """Parquet / Feather（Arrow IPC）ファイルにchunksize行ずつ書き出す"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f'{fmt}形式で出力するにはpyarrowパッケージが必要です')
+    writer = None
+    schema = None
+    try:
+        for start in range(0, max(len(df), 1), chunksize):
+            # 先に行を切り出してから列を選ぶ（列の選択は全行のコピーになるため、チャンクごとにしない）
+            chunk = df.iloc[start:start + chunksize][columns]
+            if decimals is not None:
+                chunk = chunk.round(decimals)
+            chunk = chunk.reset_index()
+            if writer is None:
+                schema = pa.Table.from_pandas(chunk, preserve_index=False).schema
+                if fmt == 'parquet':
+                    writer = pq.ParquetWriter(filename, schema, compression=compression or 'none')
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=compression)
+                    writer = pa.ipc.new_file(filename, schema, options=options)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if step is not None:
+                step(min(start + chunksize, len(df)), len(df))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_frame(df: pd.DataFrame, columns: list, filename: str, fmt: str = 'csv',
+                 compression: Optional[str] = None, decimals: Optional[int] = None,
+                 chunksize: int = EXPORT_CHUNK_ROWS, step=None):
+    """
+    スループットをファイルに出力する
+    chunksize行ずつ変換して書き出すため、出力中に使うメモリは行数によらずほぼ一定になる
+
+    Args:
+        df (pd.DataFrame): 日時をインデックスとするDataFrame
+        columns (list): 出力する列名
+        filename (str): 出力ファイル名
+        fmt (str): 出力形式（'csv'、'parquet'、'feather'）
+        compression (Optional[str]): 圧縮方式（CSVは'gzip'、'zstd'、
+                                     Parquetは'snappy'、'gzip'、'zstd'など、Featherは'lz4'、'zstd'）
+        decimals (Optional[int]): 小数点以下の桁数（Noneの場合は丸めない）
+        chunksize (int): 一度に書き出す行数
+        step: chunksize行書き出すたびに、step(出力済みの行数, 行数)で呼ばれる関数
+              （中止する場合はconcurrent.futures.CancelledErrorを送出する）
+
+    Raises:
+        ImportError: 圧縮方式・出力形式に必要なパッケージがない
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'出力形式が不正です: {fmt}')
+    with perf.span('export', rows=len(df), file=filename, format=fmt, compression=compression) as record:
+        try:
+            if fmt == 'csv':
+                done = 0
+                with _open_csv(filename, compression) as f:
+                    for count, text in enumerate(iter_csv_chunks(df, columns, chunksize, decimals)):
+                        f.write(text)
+                        if count > 0:
+                            done = min(done + chunksize, len(df))
+                            if step is not None:
+                                step(done, len(df))
+            else:
+                _write_arrow(df, columns, filename, fmt, chunksize, compression, decimals, step)
+        except BaseException:
+            # 中止・エラーの場合は書きかけのファイルを残さない
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
+        record['bytes'] = os.path.getsize(filename)
+
+
+def write_csv(df: pd.DataFrame, columns: list, filename: str, compression: Optional[str] = None,
+              decimals: Optional[int] = None, step=None):
+    """
+    スループットをCSVファイルに出力する（export_frameのCSV形式）
+
+    Args:
+        df (pd.DataFrame): 出力するDataFrame
+        columns (list): 出力する列名
+        filename (str): 出力ファイル名
+        compression (Optional[str]): 圧縮方式（None、'gzip'、'zstd'）
+        decimals (Optional[int]): 小数点以下の桁数（Noneの場合は丸めない）
+        step: export_frameのstep
+    """
+    export_frame(df, columns, filename, 'csv', compression=compression, decimals=decimals, step=step)
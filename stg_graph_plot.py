@@ -1,8 +1,10 @@
+import concurrent.futures
 import datetime
+import itertools
 import os
-import re
+import queue
+import sys
 import threading
-import time
 import tkinter as tk
 import tkinter.scrolledtext as tkst
 import tkinter.ttk as ttk
@@ -15,37 +17,65 @@ import pandas as pd
 from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
                                                NavigationToolbar2Tk)
 from matplotlib.figure import Figure
-from matplotlib.ticker import AutoMinorLocator
+
+from stg_core import (MEAN_TIMES, PLOT_BUCKETS_PER_PIXEL, ExecTime,
+                      PreviewRenderer, StgCache, StgSeries, ViewCache,
+                      combine_views, decimate_minmax, detail_views,
+                      export_filename, export_frame, group_stg_files,
+                      load_stg_files, masked_message, now, perf, plot_graph,
+                      resample_multi, scale_view, scan_error_message,
+                      stats_filename, stats_text, target_names,
+                      write_stats_csv)
 
 __version__ = '1.1.0'
 plt.style.use('ggplot')
 font = {'family': 'meiryo'}
 plt.rc('font', **font)
 
-# 集計単位の選択肢
-MEAN_TIMES = {
-    '生データ': 'org',
-    '10秒平均': '10S',
-    '15秒平均': '15S',
-    '30秒平均': '30S',
-    '1分平均': '1T',
-    '2分平均': '2T',
-    '5分平均': '5T',
-    '10分平均': '10T',
-    '15分平均': '15T',
-    '30分平均': '30T',
-    '1時間平均': '1H',
-    '3時間平均': '3H',
-    '6時間平均': '6H',
-    '12時間平均': '12H',
-    '1日平均': '1D',
+# 複数の対象を読み込んだときの表示方法
+PLOT_MODES = {
+    '個別': 'single',
+    '重ね表示': 'overlay',
+    '合計': 'sum',
 }
 
+# ファイル出力の形式の選択肢（出力形式, 圧縮方式）
+EXPORT_CHOICES = {
+    'CSV': ('csv', None),
+    'CSV（gzip圧縮）': ('csv', 'gzip'),
+    'CSV（zstd圧縮）': ('csv', 'zstd'),
+    'Parquet': ('parquet', 'snappy'),
+    'Feather': ('feather', None),
+}
+# ファイル出力の小数点以下の桁数の選択肢
+DECIMALS_CHOICES = {
+    '桁数制限なし': None,
+    '小数点以下3桁': 3,
+    '小数点以下6桁': 6,
+}
+# スループット統計のしきい値の選択肢（bps）
+THRESHOLD_CHOICES = {
+    '10 Mbps': int(10e6),
+    '50 Mbps': int(50e6),
+    '100 Mbps': int(100e6),
+    '500 Mbps': int(500e6),
+    '1 Gbps': int(1e9),
+    '10 Gbps': int(10e9),
+}
 
-def now(format: str = '%Y-%m-%d %H:%M:%S') -> str:
-    """現在時刻文字列を返す
-    """
-    return datetime.datetime.now().strftime(format)
+# パフォーマンス表示で選べるプロファイル
+PROFILE_CHOICES = {
+    'なし': None,
+    'cProfile': 'cprofile',
+    'tracemalloc': 'tracemalloc',
+}
+# パフォーマンス表示に出す最近の記録の件数
+PERF_RECENT = 200
+
+# バックグラウンド処理の優先度（小さいほど先に実行する）
+PRIORITY_VIEW = 0    # プレビュー・表示範囲の再描画（操作への応答）
+PRIORITY_LOAD = 1    # 読込・更新・グラフ表示
+PRIORITY_EXPORT = 2  # CSVファイル出力
 
 
 class MyLabelFrame(tk.LabelFrame):
@@ -209,6 +239,21 @@ class SelectOutputPeriodFrame(MyLabelFrame):
         self.cb_to['state'] = tk.NORMAL
         self.cb_to.current(len(dates)-1)  # 初期値を設定
 
+    def add_values(self, dates):
+        """日付の選択肢を追加する
+            終了日が最終日を選択していた場合は、追加後の最終日に合わせる
+        """
+        values = list(self.cb_to['values'])
+        new_values = [str(d) for d in dates if str(d) not in values]
+        if len(new_values) == 0:
+            return
+        at_last = self.var_to.get() == values[-1] if values else True
+        values += new_values
+        self.cb_from['values'] = values
+        self.cb_to['values'] = values
+        if at_last:
+            self.cb_to.current(len(values)-1)
+
     # from の日付が to を超えたら to の値を修正する
     def check_var_to(self, event=None):
         if self.var_from.get() > self.var_to.get():
@@ -330,28 +375,284 @@ class SelectAxisScaleFrame(MyLabelFrame):
             self.sb['state'] = tk.DISABLED
 
 
+class SelectTargetFrame(MyLabelFrame):
+    """表示する対象と、複数の対象を読み込んだときの表示方法の選択フレーム
+    """
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master=master, text='表示対象', **kwargs)
+
+        global var_target, var_plot_mode
+        self.var_target = var_target
+        self.var_plot_mode = var_plot_mode
+        # 対象（個別表示の対象と、機器情報・CSV情報に表示する対象）
+        self.cb = MyCombobox(
+            master=self, textvariable=self.var_target, state=tk.DISABLED, width=24,
+        )
+        self.cb.grid(row=0, column=0, columnspan=len(PLOT_MODES), sticky=tk.W)
+        # 表示方法
+        for column, text in enumerate(PLOT_MODES.keys()):
+            tk.Radiobutton(
+                master=self, text=text, value=text, variable=self.var_plot_mode,
+            ).grid(row=1, column=column, sticky=tk.W)
+
+    def set_values(self, names: list):
+        self.cb['values'] = list(names)
+        self.cb['state'] = 'readonly'
+        if self.var_target.get() not in names:
+            self.cb.current(len(names)-1)  # 初期値を設定
+
+
+class PerformanceWindow(tk.Toplevel):
+    """処理時間の記録（perf）の表示ウィンドウ
+        区間ごとの集計と最近の記録を表示し、JSONファイルに保存できる。
+        プロファイルを選ぶと、次の処理の1回だけcProfile / tracemallocの結果を記録する
+    """
+    def __init__(self, master=None):
+        super().__init__(master=master)
+        self.title('パフォーマンス')
+        frame = tk.Frame(self)
+        frame.pack(fill=tk.X)
+        tk.Label(frame, text='次の処理のプロファイル').pack(side=tk.LEFT, padx=2, pady=2)
+        self.var_profile = tk.StringVar(value='なし')
+        cb = MyCombobox(frame, textvariable=self.var_profile, values=list(PROFILE_CHOICES))
+        cb.bind('<<ComboboxSelected>>', lambda event: perf.capture_next(PROFILE_CHOICES[self.var_profile.get()]))
+        cb.pack(side=tk.LEFT, padx=2, pady=2)
+        for text, command in (('更新', self.update_view), ('JSON保存', self.save_json), ('クリア', self.clear)):
+            tk.Button(frame, text=text, width=10, command=command).pack(side=tk.LEFT, padx=2, pady=2)
+        self.text = MyScrolledText(self, width=110, height=32, font=('ms gothic', 10))
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.update_view()
+
+    def update_view(self):
+        """集計と最近の記録を表示し直す"""
+        lines = [f'{"区間":<14}{"回数":>8}{"合計(秒)":>12}{"最大(秒)":>12}{"行数":>16}{"バイト数":>16}']
+        for total in perf.summary():
+            lines.append(f'{total["name"]:<16}{total["count"]:>10,}{total["seconds"]:>14.3f}'
+                         f'{total["max_seconds"]:>14.3f}{total["rows"]:>18,}{total["bytes"]:>18,}')
+        lines += ['', f'最近の記録（{PERF_RECENT}件まで）']
+        records = perf.records()
+        for record in records[-PERF_RECENT:]:
+            indent = '  ' if record['parent'] is not None else ''
+            rows = '' if record['rows'] is None else f' {record["rows"]:,} rows'
+            nbytes = '' if record['bytes'] is None else f' {record["bytes"]:,} bytes'
+            start = datetime.datetime.fromtimestamp(record['start']).strftime('%H:%M:%S.%f')[:-3]
+            lines.append(f'{start} {indent}{record["name"]} {record["seconds"]:.4f} sec{rows}{nbytes}'
+                         f' [{record["thread"]}]')
+        # 最後に記録したプロファイル
+        profiles = [record for record in records if 'profile' in record]
+        if profiles:
+            record = profiles[-1]
+            lines += ['', f'プロファイル（{record["name"]}、{record["profile_mode"]}）']
+            if 'peak_bytes' in record:
+                lines.append(f'最大メモリ: {record["peak_bytes"]:,} bytes')
+            lines.append(record['profile'])
+        self.text['state'] = tk.NORMAL
+        self.text.delete('1.0', 'end')
+        self.text['state'] = tk.DISABLED
+        self.text.write('\n'.join(lines) + '\n')
+        self.text.see('1.0')
+        if perf.profile_mode is None:
+            self.var_profile.set('なし')
+
+    def save_json(self):
+        """記録をJSONファイルに保存する"""
+        filename = filedialog.asksaveasfilename(
+            parent=self,
+            filetypes=[('JSON', '*.json')],
+            defaultextension='.json',
+            initialfile=f'stg_perf_{now("%Y%m%d_%H%M%S")}.json',
+        )
+        if filename:
+            perf.to_json(filename)
+
+    def clear(self):
+        perf.clear()
+        self.update_view()
+
+
+class UiQueue():
+    """ワーカースレッドからメインスレッドへの処理の受け渡し
+        tkinterはスレッドセーフではないため、ワーカースレッドはウィジェットを直接操作せず、
+        postで関数をキューに入れる。メインループはafterで定期的にキューを取り出して実行する
+    """
+    def __init__(self, widget: tk.Misc, interval: int = 50):
+        self.widget = widget
+        self.interval = interval  # キューを確認する間隔（ミリ秒）
+        self.queue = queue.Queue()
+        self.widget.after(self.interval, self._drain)
+
+    def post(self, func, *args):
+        """func(*args)をメインスレッドで実行する（どのスレッドからでも呼べる）"""
+        self.queue.put((func, args))
+
+    def _drain(self):
+        while True:
+            try:
+                func, args = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception:
+                self.widget.report_callback_exception(*sys.exc_info())
+        self.widget.after(self.interval, self._drain)
+
+
+class Job():
+    """バックグラウンド処理（ワーカースレッド）の中止要求と経過の通知
+    """
+    def __init__(self, ui: UiQueue, msg, progress, kind, priority: int = PRIORITY_LOAD, background: bool = False):
+        self.ui = ui
+        self.msg = msg            # メッセージフレーム
+        self.progress = progress  # 進捗を表示する関数 progress(done, total)
+        self.kind = kind          # 処理の種類（同じ種類の新しい処理を登録すると古い処理は中止する）
+        self.priority = priority
+        self.background = background  # Trueの場合は事前集計などの画面に表示しない処理
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check(self):
+        """中止要求があればconcurrent.futures.CancelledErrorを送出する"""
+        if self.cancel_event.is_set():
+            raise concurrent.futures.CancelledError()
+
+    def write(self, text: str):
+        """メッセージフレームにテキストを追記する（どのスレッドからでも呼べる）"""
+        self.ui.post(self.msg.write, text)
+
+    def step(self, done: int, total: int):
+        """進捗を表示する（どのスレッドからでも呼べる）"""
+        self.ui.post(self.progress, done, total)
+
+
+class JobScheduler():
+    """バックグラウンド処理の実行順序の管理
+        画面操作の処理は優先度の小さい順（同じ優先度は登録順）にワーカースレッドで実行する。
+        同じ種類の処理を登録すると、待ち・実行中の古い処理は中止する（結果は使わない）。
+        事前集計などのbackgroundの処理は専用のスレッドで実行し、
+        wait_interactiveで画面操作の処理が終わるまで待たせる
+    """
+    def __init__(self, workers: int = 2, on_change=None):
+        self.on_change = on_change  # 待ち・実行中の件数が変わったときに呼ぶ関数 on_change(waiting, running)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._latest = {}      # 種類ごとの最後に登録した処理
+        self._waiting = set()
+        self._running = set()
+        self._idle = threading.Event()  # 画面操作の処理の待ち・実行中がなければセット
+        self._idle.set()
+        self._queue = queue.PriorityQueue()
+        self._background = queue.PriorityQueue()
+        for _ in range(workers):
+            threading.Thread(target=self._worker, args=(self._queue,), daemon=True).start()
+        threading.Thread(target=self._worker, args=(self._background,), daemon=True).start()
+
+    def submit(self, job: Job, func):
+        """func()をjobの優先度で実行する（同じ種類の古い処理は中止する）"""
+        with self._lock:
+            old = self._latest.get(job.kind)
+            if old is not None:
+                old.cancel()
+            self._latest[job.kind] = job
+            self._waiting.add(job)
+            self._update_idle()
+        queue_ = self._background if job.background else self._queue
+        queue_.put((job.priority, next(self._seq), job, func))
+        self._changed()
+
+    def _worker(self, queue_: queue.PriorityQueue):
+        while True:
+            (_, _, job, func) = queue_.get()
+            with self._lock:
+                self._waiting.discard(job)
+                self._running.add(job)
+            self._changed()
+            try:
+                func()
+            finally:
+                with self._lock:
+                    self._running.discard(job)
+                    if self._latest.get(job.kind) is job:
+                        del self._latest[job.kind]
+                    self._update_idle()
+                self._changed()
+
+    def _update_idle(self):
+        if any(not job.background for job in self._waiting | self._running):
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(*self.depth())
+
+    def depth(self) -> tuple:
+        """(待ちの件数, 実行中の件数)を返す"""
+        with self._lock:
+            return (len(self._waiting), len(self._running))
+
+    def wait_interactive(self, job: Job):
+        """画面操作の処理の待ち・実行中がなくなるまで待つ（backgroundの処理から呼ぶ）
+            待っている間に中止要求があればconcurrent.futures.CancelledErrorを送出する
+        """
+        while not self._idle.wait(0.1):
+            job.check()
+        job.check()
+
+    def cancel(self, background: bool = False) -> int:
+        """
+        待ち・実行中の処理を中止し、中止した件数を返す
+
+        Args:
+            background (bool): Trueの場合はbackgroundの処理も中止する
+        """
+        with self._lock:
+            jobs = [job for job in self._waiting | self._running if background or not job.background]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+
 class ButtonFrame(tk.Frame):
-    def __init__(self, target, file_info, period, msg, filemenu, master=None, **kwargs):
+    def __init__(self, target, file_info, period, select_target, msg, filemenu, master=None, **kwargs):
         super().__init__(master=master)
 
-        global var_mean_time, var_axis_unit, var_from, var_to
+        global var_mean_time, var_axis_unit, var_from, var_to, var_stream_read, var_target, var_plot_mode
         self.var_mean_time = var_mean_time
         self.var_axis_unit = var_axis_unit
         self.var_from = var_from
         self.var_to = var_to
+        self.var_stream_read = var_stream_read
+        self.var_target = var_target
+        self.var_plot_mode = var_plot_mode
         self.TargetFrame = target
         self.FileInfoFrame = file_info
         self.PeriodFrame = period
+        self.SelectTargetFrame = select_target
+        self.SelectTargetFrame.cb.bind('<<ComboboxSelected>>', self._show_target)
         self.MsgFrame = msg  # メッセージフレーム
         self.filemenu = filemenu
-        self.df = pd.DataFrame()
+        self.series = {}  # 対象の表示名ごとの読込済みデータ（StgSeries）
+        self.cache = StgCache()
+        self.views = ViewCache()  # 計算結果のキャッシュ
+        self.preview_view = None  # プレビュー中の間引く前のデータ (df, 描画する列名のリスト, _view_paramsの戻り値)
+        self.file_info = []       # CSV情報の文字列のリスト
+        self.stats_info = []      # スループット統計の文字列のリスト
+        self._lod_after = None    # 拡大・縮小時の再描画の予約ID
+        self.ui = UiQueue(self)   # ワーカースレッドからの画面更新
+        self.jobs = set()         # 実行中のバックグラウンド処理（画面操作の処理のみ）
+        self.perf_window = None   # パフォーマンス表示のウィンドウ
+        self.scheduler = JobScheduler(on_change=lambda *depth: self.ui.post(self._show_depth, *depth))
         # 読込ボタン
         width = len('ファイル読込') * 2
         self.ReadButton = tk.Button(
             self,
             text='ファイル読込',
             width=width,
-            command=self.read_stg_thread,
+            command=self.read_stg,
         )
         # self.ReadButton.pack(side=tk.LEFT, padx=2, pady=2)
         # プレビューボタン
@@ -372,6 +673,30 @@ class ButtonFrame(tk.Frame):
             state=tk.DISABLED,
         )
         self.DrawButton.pack(side=tk.LEFT, padx=2, pady=2)
+        # 更新ボタン
+        self.RefreshButton = tk.Button(
+            self,
+            text='データ更新',
+            width=width,
+            command=self.refresh_stg,
+            state=tk.DISABLED,
+        )
+        self.RefreshButton.pack(side=tk.LEFT, padx=2, pady=2)
+        # 進捗バー
+        self.ProgressBar = ttk.Progressbar(self, length=120, mode='determinate')
+        self.ProgressBar.pack(side=tk.LEFT, padx=2, pady=2)
+        # 中止ボタン
+        self.CancelButton = tk.Button(
+            self,
+            text='中止',
+            width=len('中止') * 2,
+            command=self.cancel_jobs,
+            state=tk.DISABLED,
+        )
+        self.CancelButton.pack(side=tk.LEFT, padx=2, pady=2)
+        # 処理待ちの件数
+        self.DepthLabel = tk.Label(self, width=len('待ち 00 / 実行中 0') + 2, anchor=tk.W)
+        self.DepthLabel.pack(side=tk.LEFT, padx=2, pady=2)
         # 終了ボタン
         self.QuitButton = tk.Button(
             self,
@@ -382,14 +707,128 @@ class ButtonFrame(tk.Frame):
         # self.QuitButton.pack(side=tk.LEFT, padx=2, pady=2)
 
     def abort(self):
+        self.scheduler.cancel(background=True)
         plt.close('all')
         root.destroy()
 
-    def read_stg_thread(self):
-        th = threading.Thread(target=self.read_stg, args=())
-        th.start()
+    def start_job(self, kind, work, done=None, finished=None, determinate: bool = False,
+                  priority: int = PRIORITY_LOAD, background: bool = False) -> Job:
+        """
+        work(job)をスケジューラーに登録してワーカースレッドで実行し、戻り値をdone(戻り値)でメインスレッドに渡す
+        workの中ではウィジェットを操作せず、job.write、job.stepで経過を通知する
+        同じ種類の処理が待ち・実行中の場合は、古い処理を中止する（古い処理のdoneは呼ばない）
+
+        Args:
+            kind: 処理の種類
+            work: ワーカースレッドで実行する関数
+            done: 正常に完了した後にメインスレッドで実行する関数
+            finished: 完了・中止・エラーのいずれでも、最後にメインスレッドで実行する関数
+            determinate (bool): Trueの場合は進捗バーにjob.stepの進捗を表示する
+                                （Falseの場合は処理中であることだけを表示する）
+            priority (int): 優先度（PRIORITY_VIEW、PRIORITY_LOAD、PRIORITY_EXPORT）
+            background (bool): Trueの場合は画面操作の処理の合間に実行する（進捗バーに表示しない）
+        """
+        job = Job(self.ui, self.MsgFrame, self._show_progress, kind, priority, background)
+        if not background:
+            self.jobs.add(job)
+            self.CancelButton['state'] = tk.NORMAL
+            if determinate:
+                self.ProgressBar.stop()
+                self.ProgressBar.config(mode='determinate', value=0)
+            elif len(self.jobs) == 1:
+                self.ProgressBar.config(mode='indeterminate')
+                self.ProgressBar.start(20)
+
+        # 処理時間の記録（画面操作の処理は、指定があればプロファイルも記録する）
+        name = kind if isinstance(kind, str) else kind[0]
+        record = perf.span(name) if background else perf.operation(name)
+
+        def run():
+            try:
+                job.check()  # 待っている間に中止された処理は実行しない
+                with record:
+                    result = work(job)
+            except concurrent.futures.CancelledError:
+                pass  # 中止のメッセージはcancel_jobsで出力する
+            except Exception as err:
+                self.ui.post(self._show_error, 'エラー', f'Error!：{err}\n', f'処理中にエラーが発生しました\n{err}')
+            else:
+                if done is not None and not job.cancel_event.is_set():
+                    self.ui.post(done, result)
+            finally:
+                self.ui.post(self._finish_job, job, finished)
+
+        self.scheduler.submit(job, run)
+        return job
+
+    def _finish_job(self, job: Job, finished=None):
+        if finished is not None:
+            finished()
+        if job.background:
+            return
+        self.jobs.discard(job)
+        if len(self.jobs) == 0:
+            self.ProgressBar.stop()
+            self.ProgressBar.config(mode='determinate', value=0)
+            self.CancelButton['state'] = tk.DISABLED
+
+    def _show_progress(self, done: int, total: int):
+        self.ProgressBar.stop()
+        self.ProgressBar.config(mode='determinate', maximum=max(total, 1), value=done)
+
+    def show_performance(self):
+        """
+        パフォーマンス表示のウィンドウを開く（開いている場合は最新の記録で表示し直す）
+        """
+        if self.perf_window is None or not self.perf_window.winfo_exists():
+            self.perf_window = PerformanceWindow(master=self)
+        else:
+            self.perf_window.update_view()
+            self.perf_window.lift()
+
+    def _show_depth(self, waiting: int, running: int):
+        self.DepthLabel['text'] = f'待ち {waiting} / 実行中 {running}' if waiting + running > 0 else ''
 
-    def read_stg(self):
+    def cancel_jobs(self):
+        """
+        待ち・実行中のバックグラウンド処理を中止する（事前集計は中止しない）
+        """
+        if self.scheduler.cancel() > 0:
+            self.MsgFrame.write(f'{now()} 中止しました\n')
+
+    def build_pyramids(self, series_list: list):
+        """
+        対象ごとの事前集計をバックグラウンドで作成する（画面操作の処理を優先する）
+        """
+        for series in series_list:
+            def work(job: Job, series=series):
+                series.build_pyramid(wait=lambda: self.scheduler.wait_interactive(job))
+            self.start_job(('pyramid', tuple(series.target)), work, background=True)
+
+    def _show_error(self, title: str, log: str, message: str):
+        self.MsgFrame.write(log)
+        messagebox.showerror(title, message)
+
+    def _set_state(self, state):
+        """
+        ボタンとファイルメニューの状態を変更する
+        """
+        self.ReadButton['state'] = state
+        self.DrawButton['state'] = state
+        self.PreviewButton['state'] = state
+        self.RefreshButton['state'] = state
+        for label in ('CSVファイル読込', 'CSVファイル追加読込', 'CSVファイル更新', 'CSVファイル出力'):
+            self.filemenu.entryconfigure(label, state=state)
+
+    def read_stg(self, append: bool = False):
+        """
+        CSVファイルを読み込む
+        対象情報の異なるファイルは対象ごとにまとめて読み込む
+        ファイルの選択はメインスレッド、チェックと読込はワーカースレッドで行う
+
+        Args:
+            append (bool): Trueの場合は読込済みの対象を残して追加する（同じ対象は読み込み直す）
+        """
         # ファイルダイアログを開く
         filetypes = [('STGローテーションファイル', '*.csv;*.csv.*'), ('すべて', '*'), ]
         csv_filenames = filedialog.askopenfilenames(filetypes=filetypes, initialdir='.',
@@ -399,273 +838,410 @@ class ButtonFrame(tk.Frame):
             return
 
         self.MsgFrame.write(f'\n{now()} CSVファイル読込開始（{len(csv_filenames)} files）\n')
-
-        # CSVファイルのチェック
-        for idx, filename in enumerate(csv_filenames):
-            line = ''
-            # ファイルを開いて1行読み込み
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    line = f.readline().rstrip()  # 1行読み込み
-            except UnicodeDecodeError as err:
-                self.MsgFrame.write(f'Error!：文字コードエラー\n  {filename}\n')
-                messagebox.showerror('文字コードエラー', f'文字コードがUTF-8ではありません\n{filename}\n{err}')
-                return
-            except Exception as err:
-                self.MsgFrame.write(f'Error!：ファイルオープンエラー\n  {filename}\n')
-                messagebox.showerror('ファイルオープンエラー', f'ファイルが開けません\n{filename}\n{err}')
-                return
-
-            # チェック１：STGのファイルであることのチェック
-            #   行頭がSTGでカンマ区切りで5カラムあること
-            columns = line.split(',')
-            if line.startswith('STG') is False or len(columns) != 5:
-                self.MsgFrame.write(f'Error!：ファイルフォーマットエラー\n  {filename}\n')
-                messagebox.showerror(
-                    'ファイルフォーマットエラー',
-                    f'STGのCSVファイルではありません\n{filename}'
-                )
-                return
-            # ターゲットアドレスを取得
-            m = re.match('Target Address:(.+)', columns[1])
-            if not m:
-                self.MsgFrame.write(f'Error!：ファイルフォーマットエラー\n  {filename}\n')
-                messagebox.showerror(
-                    'ファイルフォーマットエラー',
-                    f'STGのCSVファイルではありません\n{filename}'
-                )
-                return
-            self.target_ip = m.group(1)
-
-            # チェック２：Target情報が前に読み込んだファイルと一致するかチェック
-            if idx == 0:  # ファイル1個目
-                target = columns[1:]
-            elif target != columns[1:]:
-                self.MsgFrame.write(f'Error!：ファイル指定エラー\n  {filename}\n')
-                messagebox.showerror(
-                    'ファイル指定エラー',
-                    f'{os.path.basename(filename)} の対象情報が一致しません'
+        # CSVファイルの読込中はボタンとメニューをロックする
+        self._set_state(tk.DISABLED)
+        old_series = dict(self.series)
+        stream = self.var_stream_read.get()
+
+        def work(job: Job):
+            # CSVファイルのチェック（すべてのファイルを並列にチェックし、エラーはまとめて表示する）と、
+            # 対象情報ごとのまとめ（ほかのファイルに含まれるファイルは読み込まない）
+            (groups, skipped, errors, manifest) = group_stg_files(csv_filenames)
+            if errors:
+                messages = [scan_error_message(filename, err) for filename, err in errors]
+                self.ui.post(self._show_error, 'ファイルチェックエラー',
+                             ''.join(f'Error!：{message}\n' for message in messages),
+                             f'{len(errors)} 個のファイルにエラーがあります\n\n' + '\n'.join(messages[:10]))
+                return None
+            for filename in skipped:
+                job.write(f' ほかのファイルと重複するため読み込みません：{os.path.basename(filename)}\n')
+            total = sum(len(filenames) for filenames in groups.values())
+
+            # CSVファイルの読込
+            series = {tuple(s.target): s for s in old_series.values()} if append else {}
+            done = 0
+            for target, filenames in groups.items():
+                if len(groups) > 1:
+                    job.write(f' {target[0]}\n')
+                df = load_stg_files(
+                    filenames,
+                    cache=self.cache,
+                    stream=stream,
+                    progress=job.write,
+                    step=lambda count, _: job.step(done + count, total),
+                    cancel=job.cancel_event,
+                    manifest=manifest,
                 )
+                done += len(filenames)
+                job.write(f' {masked_message(df.attrs["masked"])}\n')
+                series[target] = StgSeries(target, df, filenames)
+            # 対象ごとの表示名（ターゲットアドレスが重複する場合はifIndex等を付け、必ず異なる名前にする）
+            for target, name in target_names(list(series)).items():
+                series[target].name = name
+            dates = sorted(set().union(*(s.dates() for s in series.values())))
+            return (series, list(groups), dates)
+
+        def loaded(result):
+            if result is None:
                 return
+            (series, targets, dates) = result
+            # 置き換えた対象の事前集計を中止し、新しい対象の事前集計をバックグラウンドで作成する
+            for s in old_series.values():
+                if series.get(tuple(s.target)) is not s:
+                    s.pyramid.cancel()
+            self.build_pyramids([series[target] for target in targets])
+            self.series = {s.name: s for s in series.values()}
+            self.views.clear()
+
+            self.MsgFrame.write(f'{now()} CSVファイル読込完了\n')
+
+            # カレントディレクトの変更
+            os.chdir(os.path.dirname(csv_filenames[0]))
+            # self.MsgFrame.write(f' ファイル出力先：{os.getcwd()}\n')
+
+            # 表示対象の選択肢（最後に読み込んだ対象を選択する）
+            self.var_target.set(series[targets[-1]].name)
+            self.SelectTargetFrame.set_values(list(self.series))
+            # 機器情報・ファイル情報出力
+            self._show_target()
+            # 期間情報設定（全対象の日付）
+            self.PeriodFrame.set_values(dates)
+
+            self.preview_graph()
+
+        def finished():
+            # 読込済みのデータがあればロックを解除する（ファイル読込は常に可能）
+            self._set_state(tk.NORMAL if self.series else tk.DISABLED)
+            self.ReadButton['state'] = tk.NORMAL
+            self.filemenu.entryconfigure('CSVファイル読込', state=tk.NORMAL)
+            self.filemenu.entryconfigure('CSVファイル追加読込', state=tk.NORMAL)
+
+        self.start_job('load', work, loaded, finished, determinate=True)
+
+    def refresh_stg(self):
+        """
+        読込済みのCSVファイルの追記分だけを読み込み、対象ごとのデータの末尾に追加する
+        """
+        if len(self.series) == 0:
+            return
+        self.RefreshButton['state'] = tk.DISABLED
+        self.MsgFrame.write(f'\n{now()} CSVファイル更新\n')
+        series_list = list(self.series.values())
+
+        def work(job: Job):
+            t = ExecTime()
+            added = 0
+            dates = set()
+            rebuild = []
+            for series in series_list:
+                job.check()
+                version = series.version
+                (df, errors) = series.refresh()
+                if series.version != version:
+                    self.views.discard(version)  # 古いデータの計算結果は使わないため削除する
+                for filename, err in errors:
+                    job.write(f'Error!：ファイルオープンエラー\n  {filename}\n  {err}\n')
+                dates |= series.dates()
+                added += len(df)
+                if len(df) > 0 and not series.pyramid.complete:
+                    rebuild.append(series)
+            job.write(f' 追加行数: {added:,} ... {t.laptime:.3f} sec\n')
+            return (added, sorted(dates), rebuild)
+
+        def refreshed(result):
+            (added, dates, rebuild) = result
+            # 作成中だった事前集計は作り直す
+            self.build_pyramids(rebuild)
+            if added > 0:
+                self.PeriodFrame.add_values(dates)
+                self._show_target()
+                self.preview_graph()
+
+        def finished():
+            self.RefreshButton['state'] = tk.NORMAL
+
+        self.start_job('refresh', work, refreshed, finished)
+
+    def _show_target(self, event=None):
+        """
+        選択中の対象の機器情報とCSV情報を出力する
+        """
+        series = self.series.get(self.var_target.get())
+        if series is None:
+            return
+        self.TargetFrame.write(series.target)
+        self._write_file_info(series)
+        self.update_stats()
 
-        # CSVファイルの読込
-        self.ReadButton['state'] = tk.DISABLED  # ReadButtonをロック
-        self.DrawButton['state'] = tk.DISABLED  # DrawButtonをロック
-        self.PreviewButton['state'] = tk.DISABLED
-        self.filemenu.entryconfigure('CSVファイル読込', state=tk.DISABLED)
-        self.filemenu.entryconfigure('CSVファイル出力', state=tk.DISABLED)
-        t = ExecTime()
-
-        # CSVファイルをDataFrameとして読み込み、self.dfに結合する
-        self.df = pd.DataFrame()
-        for idx, filename in enumerate(csv_filenames):
-            self.MsgFrame.write(f' [{idx+1}/{len(csv_filenames)}] "{filename}" ... ')
-            df = pd.read_csv(
-                filename,
-                encoding='SHIFT-JIS',                       # 文字コードを指定
-                header=1,                                   # 0行目（最初の行）を読み飛ばす
-                names=['date', 'uptime', 'recv', 'send'],   # カラム名を設定
-            )
-            # STGのバグでAugがAvgになっているので、置換して日時認識する
-            df['date'] = pd.to_datetime(df['date'].str.replace('Avg', 'Aug'))
-            # uptimeが0の行は読み取り失敗のため削除する
-            df.drop(df.query('uptime == 0').index, inplace=True)
-            # uptimeの列を削除する
-            df.drop('uptime', axis=1, inplace=True)
-            self.df = pd.concat([self.df, df])
-            self.MsgFrame.write(f'{t.laptime:.3f} sec\n')
-
-        self.MsgFrame.write(f'{now()} CSVファイル読込完了\n')
-
-        # カレントディレクトの変更
-        os.chdir(os.path.dirname(csv_filenames[0]))
-        # self.MsgFrame.write(f' ファイル出力先：{os.getcwd()}\n')
-        # 重複行を削除する
-        self.df.drop_duplicates(inplace=True)
-        # 'date'をインデックスにする
-        self.df.set_index('date', inplace=True)
-        # インデックス順（日時）でソートする
-        self.df.sort_index(inplace=True)
-        # 1行目を削除する（取得値が非常に大きい場合があるため）
-        self.df.drop(self.df.index[0], inplace=True)
-        # delta_timeを計算する
-        self.df['delta_time'] = self.df.index.to_series().diff().dt.total_seconds()
-
-        # 機器情報出力
-        self.TargetFrame.write(target)
-        # ファイル情報出力
-        recv = self.df['recv'] * 8 // self.df['delta_time']
-        send = self.df['send'] * 8 // self.df['delta_time']
-        delta = self.df['delta_time']
+    def _write_file_info(self, series):
+        """
+        CSV情報を出力する（日ごとの集計情報から求め、DataFrameは走査しない）
+        """
+        def fmt(value, spec: str) -> str:
+            # 有効な行がない（すべて除外された）場合はNaNになるので'-'を表示する
+            return '-' if pd.isna(value) else format(value, spec)
+
+        df = series.df
+        info = series.days.summary()
         text = [
-            f'開始日時: {str(self.df.index[0])[:-7]}',
-            f'終了日時: {str(self.df.index[-1])[:-7]}',
-            f'取得間隔: {delta.min():,.2} ～ {delta.max():,.2} 秒',
-            f'取得行数: {self.df.shape[0]:,}',
-            f'受信帯域: 最大 {int(recv.max()):,} bps',
-            f'送信帯域: 最大 {int(send.max()):,} bps',
+            f'開始日時: {str(df.index[0])[:-7]}',
+            f'終了日時: {str(df.index[-1])[:-7]}',
+            f'取得間隔: {fmt(info["interval_min"], ",.2")} ～ {fmt(info["interval_max"], ",.2")} 秒',
+            f'取得行数: {info["rows"]:,}（除外 {info["masked"]:,}）',
+            f'受信帯域: 最大 {fmt(info["recv_max"], ",.0f")} bps',
+            f'送信帯域: 最大 {fmt(info["send_max"], ",.0f")} bps',
+            f'メモリ　: {df.memory_usage(index=True).sum() / 1024**2:,.1f} MB',
         ]
-        self.FileInfoFrame.write(text)
-        # 期間情報設定
-        self.PeriodFrame.set_values(sorted(set(self.df.index.date)))
+        self.file_info = text
+        self.FileInfoFrame.write(self.file_info + self.stats_info)
+
+    def update_stats(self):
+        """
+        選択中の対象の表示期間のスループット統計を計算し、CSV情報の下に出力する
+        計算はワーカースレッド、出力はメインスレッドで行う
+        """
+        params = self._view_params()
+        series = params['series'].get(params['target'])
+        if series is None or not params['date_from'] or not params['date_to']:
+            return
+
+        def work(job: Job):
+            stats = series.stats(params['date_from'], params['date_to'], params['threshold'], cache=self.views)
+            return stats_text(stats)
 
-        self.ReadButton['state'] = tk.NORMAL  # ReadButtonをロック解除
-        self.DrawButton['state'] = tk.NORMAL  # DrawButtonをロック解除
-        self.PreviewButton['state'] = tk.NORMAL  # PreviewButtonをロック解除
-        self.filemenu.entryconfigure('CSVファイル読込', state=tk.NORMAL)
-        self.filemenu.entryconfigure('CSVファイル出力', state=tk.NORMAL)
+        def show(text):
+            self.stats_info = text
+            self.FileInfoFrame.write(self.file_info + self.stats_info)
 
-        self.preview_graph()
+        self.start_job('stats', work, show, priority=PRIORITY_VIEW)
 
-    def _resample_df(self) -> tuple:
+    def _view_params(self) -> dict:
         """
-        リサンプルしたDataFrameと各種変数を返す
+        集計・表示の設定を返す
+        tkinterの変数はワーカースレッドから読めないため、メインスレッドで読み込んで渡す
         """
-        rule = MEAN_TIMES[self.var_mean_time.get()]
-        axis_unit = self.var_axis_unit.get()
+        return {
+            'series': dict(self.series),
+            'mean_time': self.var_mean_time.get(),
+            'plot_mode': self.var_plot_mode.get(),
+            'target': self.var_target.get(),
+            'date_from': self.var_from.get(),
+            'date_to': self.var_to.get(),
+            'axis_unit': self.var_axis_unit.get(),
+            'axis_value': None if var_axis_type.get() == 'auto' else var_axis_value.get(),
+            'threshold': THRESHOLD_CHOICES[var_threshold.get()],
+        }
 
-        # 指定時間で集約
-        if rule == 'org':
-            df = self.df.copy()
-        else:
-            df = self.df.resample(rule=rule).sum()
-            # df['delta_time'] = df.index.to_series().diff().dt.total_seconds()
-
-        # 指定期間を抽出
-        df = df[self.var_from.get():self.var_to.get()]
-
-        # スループットを計算
-        if axis_unit == 'bps':
-            div_unit = 1
-        elif axis_unit == 'kbps':
-            div_unit = int(1e3)
-        elif axis_unit == 'Mbps':
-            div_unit = int(1e6)
-        elif axis_unit == 'Gbps':
-            div_unit = int(1e9)
-
-        recv_unit = 'recv_' + axis_unit
-        send_unit = 'send_' + axis_unit
-        df[recv_unit] = df['recv'] * 8 // df['delta_time'] / div_unit
-        df[send_unit] = df['send'] * 8 // df['delta_time'] / div_unit
-
-        # # CSVファイル出力
-        # output_columns = ['delta_time', recv_unit, send_unit]
-        # df[output_columns].to_csv(f'{self.target_ip}_{var_mean_time.get()}.csv', sep=',')
-
-        # 送受信の最大値と発生日時を調べる
-        recv_max = df[recv_unit].max()
-        send_max = df[send_unit].max()
-        recv_max_date = re.sub(r'\.\d+$', '', str(df[df[recv_unit] == recv_max].index.tolist()[0]))
-        send_max_date = re.sub(r'\.\d+$', '', str(df[df[send_unit] == send_max].index.tolist()[0]))
-
-        # 送受信の最大値の文字列を作成、MbpsとGbpsは少数点3桁表示
-        if axis_unit == 'Mbps' or axis_unit == 'Gbps':
-            recv_max_str = f'{recv_max:,.3f}'
-            send_max_str = f'{send_max:,.3f}'
-        else:
-            recv_max_str = f'{int(recv_max):,}'
-            send_max_str = f'{int(send_max):,}'
-
-        strlen_max = max(len(recv_max_str), len(send_max_str))
-
-        str1 = f'受信MAX: {recv_max_str:>{strlen_max}} {axis_unit} ({recv_max_date})'
-        str2 = f'送信MAX: {send_max_str:>{strlen_max}} {axis_unit} ({send_max_date})'
-
-        return (df, recv_unit, send_unit, axis_unit, div_unit, str1, str2)
-
-    def _adjust_axes(self, ax, axis_unit, div_unit, r_max, s_max):
-        # X軸ラベル
-        ax.set_xlabel('日時')
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d %H:%M'))
-        ax.xaxis.set_minor_locator(AutoMinorLocator(6))
-        # Y軸ラベル
-        ax.set_ylabel(axis_unit)
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, loc: f'{x:,.1f}'))
-        ax.yaxis.set_minor_locator(AutoMinorLocator())
-        # グリッド線
-        ax.grid(b=True, axis='both', which='major', color='gray', linestyle='--', alpha=0.9)
-        ax.grid(b=True, axis='both', which='minor', color='gray', linestyle='--', alpha=0.2)
-        # Y軸のスケール
-        if var_axis_type.get() == 'auto':
-            ax.set_ylim(0,)
-        else:
-            ax.set_ylim([0, var_axis_value.get() // div_unit])
+    def _resample(self, params: dict) -> tuple:
+        """
+        表示方法に合わせてリサンプルしたDataFrameと各種変数を返す（ワーカースレッドから呼ばれる）
+
+        Args:
+            params (dict): _view_paramsの戻り値
 
-        # 送受信の最大値をグラフ上にテキスト表示
-        ax.text(0.05, 0.9, r_max + '\n' + s_max, family='ms gothic', transform=ax.transAxes)
+        Returns:
+            tuple: (df, 描画する列名のリスト, 出力する列名のリスト, axis_unit, Y軸の上限,
+                    最大値の文字列, タイトル, 出力ファイル名（拡張子なし）)
+        """
+        series = params['series']
+        mean_time = params['mean_time']
+        rule = MEAN_TIMES[mean_time]
+        mode = PLOT_MODES[params['plot_mode']]
+        if mode == 'single' or len(series) == 1:
+            target = series[params['target']]
+            (df, recv_unit, send_unit, axis_unit, div_unit, r_max, s_max) = target.resample(
+                rule,
+                params['date_from'],
+                params['date_to'],
+                params['axis_unit'],
+                cache=self.views,
+            )
+            columns = [recv_unit, send_unit]
+            output_columns = ['delta_time', recv_unit, send_unit]
+            text = r_max + '\n' + s_max
+            title = f'{target.name} スループット（{mean_time}）'
+            basename = f'{target.name}_{mean_time}'
+        else:
+            names = list(series)
+            (df, columns, output_columns, axis_unit, div_unit, text) = resample_multi(
+                list(series.values()),
+                rule,
+                params['date_from'],
+                params['date_to'],
+                params['axis_unit'],
+                mode=mode,
+                cache=self.views,
+            )
+            separator = ' + ' if mode == 'sum' else ' / '
+            title = f'{separator.join(names)} スループット（{mean_time}、{params["plot_mode"]}）'
+            basename = f'{"_".join(names)}_{params["plot_mode"]}_{mean_time}'
+        ylim_top = None if params['axis_value'] is None else params['axis_value'] // div_unit
+        return (df, columns, output_columns, axis_unit, ylim_top, text, title, basename)
 
     def output_graph(self):
         """
         指定の時間でスループットを計算してグラフ表示する
+        集計と間引きはワーカースレッド、描画はメインスレッドで行う
         """
-        (df, recv_unit, send_unit, axis_unit, div_unit, r_max, s_max) = self._resample_df()
+        params = self._view_params()
+        # 描画する点数をウィンドウの横幅に合わせて間引く（最大値の表示は間引く前の値）
+        width = plt.rcParams['figure.figsize'][0] * plt.rcParams['figure.dpi']
 
-        # グラフ描画
-        ax = df.plot(
-            grid=True,
-            y=[recv_unit, send_unit],
-            title=f'{self.target_ip} スループット（{var_mean_time.get()}）',
-            rot=30,
-            x_compat=True
-            )
+        def work(job: Job):
+            (df, columns, _, axis_unit, ylim_top, text, title, _) = self._resample(params)
+            job.check()
+            df = decimate_minmax(df, columns, int(width * PLOT_BUCKETS_PER_PIXEL))
+            return (df, columns, axis_unit, ylim_top, text, title)
 
-        # axesの見栄えを調整する
-        self._adjust_axes(ax, axis_unit, div_unit, r_max, s_max)
+        def draw(result):
+            (df, columns, axis_unit, ylim_top, text, title) = result
+            # グラフ描画
+            plot_graph(df, columns, title=title, axis_unit=axis_unit, ylim_top=ylim_top, text=text)
+            plt.show()
 
-        plt.show()
+        self.start_job('graph', work, draw)
 
     def preview_graph(self):
         """
         グラフをプレビューする
+        集計と間引きはワーカースレッド、描画はメインスレッドで行う
         """
-        (df, recv_unit, send_unit, axis_unit, div_unit, r_max, s_max) = self._resample_df()
-
-        # グラフ描画
-        ax.cla()
-        df.plot(
-            ax=ax,
-            grid=True,
-            y=[recv_unit, send_unit],
-            title=f'{self.target_ip} スループット（{var_mean_time.get()}）',
-            rot=30,
-            x_compat=True
-            )
-
-        # axesの見栄えを調整する
-        self._adjust_axes(ax, axis_unit, div_unit, r_max, s_max)
-
-        canvas.draw()
+        params = self._view_params()
+        # 描画する点数をcanvasの横幅に合わせて間引く（最大値の表示は間引く前の値）
+        width = fig.get_figwidth() * fig.dpi
+
+        def work(job: Job):
+            (full_df, columns, _, axis_unit, ylim_top, text, title, _) = self._resample(params)
+            job.check()
+            df = decimate_minmax(full_df, columns, int(width * PLOT_BUCKETS_PER_PIXEL))
+            return (full_df, df, columns, axis_unit, ylim_top, text, title)
+
+        def draw(result):
+            (full_df, df, columns, axis_unit, ylim_top, text, title) = result
+            # ツールバーで拡大・縮小・移動したときに、表示範囲のデータを集約・間引き直すため保存する
+            self.preview_view = (full_df, columns, params)
+            # グラフ描画（線・軸の書式は作り直さず、データと範囲だけを更新する）
+            renderer.render(df, columns, title=title, ylabel=axis_unit, ylim_top=ylim_top, text=text)
+
+        self.start_job('preview', work, draw, priority=PRIORITY_VIEW)
+        self.update_stats()
+
+    def _on_xlim_changed(self, event_ax):
+        """
+        プレビューの表示範囲が変わったら、少し待ってから表示範囲を描画し直す
+        （ドラッグ中に何度も呼ばれるため、最後の変更だけを処理する）
+        """
+        if renderer.updating:
+            return
+        if self._lod_after is not None:
+            self.after_cancel(self._lod_after)
+        self._lod_after = self.after(50, self._update_preview_lod)
 
-    def output_csv(self):
+    def _update_preview_lod(self):
         """
-        CSVファイルを出力する
+        プレビューの表示範囲のデータを、axesの横幅に合わせて集約・間引いて線を更新する
+        表示範囲を生データまたは選択中の集計単位より細かい単位で横幅に収まる場合は、
+        読込済みのデータから集約し直す（拡大すると生データまで表示する）
+        集約と間引きはワーカースレッド、線の更新はメインスレッドで行う
         """
-        (df, recv_unit, send_unit, *_) = self._resample_df()
+        self._lod_after = None
+        if self.preview_view is None:
+            return
+        (full_df, columns, params) = self.preview_view
+        if len(full_df) == 0 or renderer.lines is None:
+            return
+        x0, x1 = ax.get_xlim()
+        buckets = int(ax.bbox.width * PLOT_BUCKETS_PER_PIXEL)
+
+        def work(job: Job):
+            t0 = pd.Timestamp(mdates.num2date(x0)).tz_localize(None)
+            t1 = pd.Timestamp(mdates.num2date(x1)).tz_localize(None)
+            df = self._detail(params, t0, t1, buckets)
+            if df is None:
+                df = full_df
+            job.check()
+            # 表示範囲の前後1行を含めて二分探索で切り出す
+            start = max(df.index.searchsorted(t0) - 1, 0)
+            end = df.index.searchsorted(t1, side='right') + 1
+            return decimate_minmax(df.iloc[start:end], columns, buckets)
+
+        def draw(view):
+            # 集約している間に別のプレビューに変わっていたら更新しない
+            if self.preview_view is None or self.preview_view[0] is not full_df:
+                return
+            with perf.span('draw', rows=len(view)):
+                renderer.set_lines(view, columns)
+                canvas.draw_idle()
 
-        # CSVファイル出力
-        output_fname = f'{self.target_ip}_{var_mean_time.get()}.csv'
-        output_columns = ['delta_time', recv_unit, send_unit]
-        df[output_columns].to_csv(output_fname, sep=',')
-        self.MsgFrame.write(f'\n{now()} CSVファイル出力\n')
-        self.MsgFrame.write(f' "{os.path.abspath(output_fname)}"\n')
+        self.start_job('lod', work, draw, priority=PRIORITY_VIEW)
 
+    def _detail(self, params: dict, t0: pd.Timestamp, t1: pd.Timestamp, rows: int):
+        """
+        表示範囲t0～t1を選択中の集計単位より細かく集約したDataFrameを返す（ワーカースレッドから呼ばれる）
 
-class ExecTime():
-    """コマンドの実行時間を測定する"""
-    def __init__(self, init_time=0):
-        self.t1 = time.time() if init_time == 0 else init_time
+        Args:
+            params (dict): _view_paramsの戻り値
+            t0 (pd.Timestamp): 表示範囲の開始日時
+            t1 (pd.Timestamp): 表示範囲の終了日時
+            rows (int): 描画する行数の上限
 
-    @property
-    def laptime(self):
-        t2 = time.time()
-        result = t2 - self.t1
-        self.t1 = t2
-        return result
+        Returns:
+            pd.DataFrame: 列名は_resampleの描画する列名と同じ（細かくできない場合はNone）
+        """
+        series = params['series']
+        rule = MEAN_TIMES[params['mean_time']]
+        mode = PLOT_MODES[params['plot_mode']]
+        if mode == 'single' or len(series) == 1:
+            (_, views) = detail_views([series[params['target']]], t0, t1, rows, rule)
+            if views is None:
+                return None
+            return scale_view(views[params['target']], params['axis_unit'])[0]
+        (detail, views) = detail_views(list(series.values()), t0, t1, rows, rule)
+        if views is None:
+            return None
+        return combine_views(views, detail, params['axis_unit'], mode=mode)[0]
+
+    def clear_cache(self):
+        """
+        読込キャッシュを削除する
+        """
+        self.cache.clear()
+        self.MsgFrame.write(f'\n{now()} キャッシュ削除\n')
+        self.MsgFrame.write(f' "{self.cache.cache_dir}"\n')
 
-    @property
-    def print(self):
-        print(f'{self.laptime:.3f} sec')
+    def output_csv(self):
+        """
+        CSVファイル（または出力形式で選んだ形式のファイル）を出力する
+        集計と出力はワーカースレッドで行い、少しずつ書き出しながら進捗を表示する
+        """
+        params = self._view_params()
+        (fmt, compression) = EXPORT_CHOICES[var_export_format.get()]
+        decimals = DECIMALS_CHOICES[var_export_decimals.get()]
+        self.MsgFrame.write(f'\n{now()} ファイル出力（{var_export_format.get()}）\n')
+
+        def work(job: Job):
+            (df, _, output_columns, *_, basename) = self._resample(params)
+            # ファイル出力（複数の対象の場合は、表示方法に合わせた列をまとめて出力する）
+            output_fname = export_filename(basename, fmt, compression)
+
+            def step(done, total):
+                job.check()
+                job.step(done, total)
+
+            t = ExecTime()
+            step(0, len(df))
+            export_frame(df, output_columns, output_fname, fmt,
+                         compression=compression, decimals=decimals, step=step)
+            job.write(f' "{os.path.abspath(output_fname)}" ... {len(df):,} rows {t.laptime:.3f} sec\n')
+            # 1つの対象を出力した場合は、その対象のスループット統計も出力する
+            series = params['series']
+            if PLOT_MODES[params['plot_mode']] == 'single' or len(series) == 1:
+                stats = series[params['target']].stats(params['date_from'], params['date_to'], params['threshold'], cache=self.views)
+                stats_fname = stats_filename(basename)
+                write_stats_csv(stats, stats_fname)
+                job.write(f' "{os.path.abspath(stats_fname)}"\n')
+
+        self.start_job('csv', work, determinate=True, priority=PRIORITY_EXPORT)
 
 
 # =================================================================
@@ -681,7 +1257,16 @@ if __name__ == '__main__':
     # File Menu
     filemenu = tk.Menu(menubar, tearoff=0)
     filemenu.add_command(label='CSVファイル読込')
+    filemenu.add_command(label='CSVファイル追加読込')
+    filemenu.add_command(label='CSVファイル更新')
     filemenu.add_command(label='CSVファイル出力')
+    filemenu.add_command(label='キャッシュ削除')
+    filemenu.add_checkbutton(label='省メモリ読込')
+    exportmenu = tk.Menu(filemenu, tearoff=0)
+    filemenu.add_cascade(label='出力形式', menu=exportmenu)
+    thresholdmenu = tk.Menu(filemenu, tearoff=0)
+    filemenu.add_cascade(label='統計のしきい値', menu=thresholdmenu)
+    filemenu.add_command(label='パフォーマンス表示')
     filemenu.add_separator()
     filemenu.add_command(label='終了', command=root.destroy)
     # Add
@@ -694,6 +1279,24 @@ if __name__ == '__main__':
     var_mean_time = tk.StringVar()             # 集計時間単位（n分平均）
     var_from = tk.StringVar()             # 集計開始日
     var_to = tk.StringVar()             # 集計終了日
+    var_stream_read = tk.BooleanVar(value=False)  # 省メモリ読込
+    var_target = tk.StringVar()                   # 表示対象（個別表示・機器情報の対象）
+    var_plot_mode = tk.StringVar(value='個別')    # 複数の対象の表示方法 個別 / 重ね表示 / 合計
+    var_export_format = tk.StringVar(value='CSV')             # ファイル出力の形式（EXPORT_CHOICESのキー）
+    var_export_decimals = tk.StringVar(value='桁数制限なし')  # ファイル出力の小数点以下の桁数
+    var_threshold = tk.StringVar(value='100 Mbps')           # スループット統計のしきい値（THRESHOLD_CHOICESのキー）
+
+    # 出力形式メニュー
+    for label in EXPORT_CHOICES:
+        exportmenu.add_radiobutton(label=label, variable=var_export_format, value=label)
+    exportmenu.add_separator()
+    for label in DECIMALS_CHOICES:
+        exportmenu.add_radiobutton(label=label, variable=var_export_decimals, value=label)
+
+    # 統計のしきい値メニュー（変更したらスループット統計を計算し直す）
+    for label in THRESHOLD_CHOICES:
+        thresholdmenu.add_radiobutton(label=label, variable=var_threshold, value=label,
+                                      command=lambda: button_frame.update_stats())
 
     # tkinterのウィジェット設定
 
@@ -702,7 +1305,7 @@ if __name__ == '__main__':
     target_frame.grid(row=0, column=0)
 
     # ファイル情報
-    fileinfo_frame = InformationFrame(master=root, lines=6, text='CSV情報')
+    fileinfo_frame = InformationFrame(master=root, lines=12, text='CSV情報')
     fileinfo_frame.grid(row=0, column=1)
 
     # 集計単位の選択
@@ -712,23 +1315,28 @@ if __name__ == '__main__':
     period_frame = SelectOutputPeriodFrame(master=root)
     period_frame.grid(row=1, column=1)
 
+    # 表示対象の選択
+    select_target_frame = SelectTargetFrame(master=root)
+    select_target_frame.grid(row=2, column=0, columnspan=2)
+
     # 縦軸スケールの選択
-    SelectAxisScaleFrame(master=root).grid(row=2, column=0, columnspan=2)
+    SelectAxisScaleFrame(master=root).grid(row=3, column=0, columnspan=2)
 
     # メッセージ表示窓
     msg_frame = MyScrolledText(master=root, width=80, height=10)
-    msg_frame.grid(row=3, column=0, columnspan=2)
+    msg_frame.grid(row=4, column=0, columnspan=2)
 
     # 実行ボタン
     button_frame = ButtonFrame(
         target_frame,
         fileinfo_frame,
         period_frame,
+        select_target_frame,
         msg_frame,
         filemenu,
         master=root,
     )
-    button_frame.grid(row=4, column=0, columnspan=2, ipady=2, padx=2, pady=2)
+    button_frame.grid(row=5, column=0, columnspan=2, ipady=2, padx=2, pady=2)
 
     # プレビュー表示用のcanvasの作成
     fig = Figure()
@@ -738,16 +1346,25 @@ if __name__ == '__main__':
 
     canvas = FigureCanvasTkAgg(fig, master=root)
     canvas.draw()
-    # toolbarを表示するときは、rowspan=4にする。非表示の場合5
-    canvas.get_tk_widget().grid(row=0, column=2, rowspan=4, sticky=tk.NSEW)
+    # toolbarを表示するときは、rowspan=5にする。非表示の場合6
+    canvas.get_tk_widget().grid(row=0, column=2, rowspan=5, sticky=tk.NSEW)
 
     toolbar = NavigationToolbar2Tk(canvas, root, pack_toolbar=False)
     toolbar.update()
-    toolbar.grid(row=4, column=2, sticky=tk.W)
+    toolbar.grid(row=5, column=2, sticky=tk.W)
+
+    # プレビューの描画と、拡大・縮小・移動時の再描画
+    renderer = PreviewRenderer(fig, ax, canvas)
+    ax.callbacks.connect('xlim_changed', button_frame._on_xlim_changed)
 
     # ファイルメニュー
-    filemenu.entryconfigure('CSVファイル読込', command=button_frame.read_stg_thread, state=tk.NORMAL)
+    filemenu.entryconfigure('CSVファイル読込', command=button_frame.read_stg, state=tk.NORMAL)
+    filemenu.entryconfigure('CSVファイル追加読込', command=lambda: button_frame.read_stg(append=True), state=tk.NORMAL)
+    filemenu.entryconfigure('CSVファイル更新', command=button_frame.refresh_stg, state=tk.DISABLED)
     filemenu.entryconfigure('CSVファイル出力', command=button_frame.output_csv, state=tk.DISABLED)
+    filemenu.entryconfigure('キャッシュ削除', command=button_frame.clear_cache)
+    filemenu.entryconfigure('省メモリ読込', variable=var_stream_read)
+    filemenu.entryconfigure('パフォーマンス表示', command=button_frame.show_performance)
 
     root.title(f'STG Graph Plot  ver. {__version__}')
     root.resizable(width=False, height=False)